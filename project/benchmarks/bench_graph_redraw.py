@@ -0,0 +1,141 @@
+"""
+Benchmark of the redraw time of GraphWidget.
+
+Compares switching the highlighted data (the Temp/Wind/All buttons) by
+clearing and replotting every series, like GraphWidget did originally,
+against changing the persistent artists. The time span change of the
+radio buttons is measured as well. Every measurement includes a full
+synchronous draw of the canvas, so the deferred draw_idle is not left
+out of the numbers.
+
+Run from the project folder:
+
+    python3 benchmarks/bench_graph_redraw.py
+"""
+
+import os
+import pathlib
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent / 'controller'))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtWidgets import QApplication
+
+from model.timeseries import TimeSeries
+from view.graph import GraphWidget
+
+highlights = [([1.0, 0.2, 0.2], [True, False, False], ['bold', 'normal', 'normal']),
+              ([0.2, 1.0, 0.2], [False, True, False], ['normal', 'bold', 'normal']),
+              ([1.0, 1.0, 1.0], [False, False, False], ['bold', 'bold', 'bold'])]
+
+
+def synthetic_forecast(point_count, seed=1):
+    """
+    Generates an hourly forecast with temperature and wind speed
+    :param point_count: int, number of time steps
+    :param seed: int, random seed
+    :return: TimeSeries
+    """
+
+    rng = np.random.default_rng(seed)
+    start = datetime(2022, 1, 1)
+    times = np.datetime64(start, 's') + np.arange(point_count) * np.timedelta64(1, 'h')
+    hours = np.arange(point_count)
+    temperature = -5 + 5 * np.sin(hours * 2 * np.pi / 24) + rng.normal(0, 1, point_count)
+    wind = np.abs(rng.normal(4, 2, point_count))
+    return TimeSeries("Benchmark", times, {"temperature": temperature, "windspeedms": wind})
+
+
+def legacy_draw_graph(widget, alphas, grids, font):
+    """
+    The original draw_graph of a forecast, which cleared the axes and replotted everything, kept for comparison
+    """
+
+    x = widget.xData
+    widget.sc.ax1.cla()
+    widget.sc.ax2.cla()
+    widget.sc.ax3.cla()
+    y1 = widget.data[widget.dataKeys[0]]
+    y2 = widget.data[widget.dataKeys[1]]
+
+    ax1 = widget.sc.ax1
+    ax1.set_zorder(1)
+    ax1.patch.set_visible(False)
+    ax1.plot(x, y1, 'r-', label="Temperature", alpha=alphas[0])
+    ax1.set_ylabel('°C', loc='top', color='r', fontweight=font[0], alpha=alphas[0], rotation=0)
+    start, end = ax1.get_ylim()
+    ax1.yaxis.set_ticks(np.arange(round(start - 2), round(end + 2), 2))
+    ax1.spines['top'].set_visible(False)
+    if grids[0]:
+        ax1.grid(grids[0], linestyle='--', color='r')
+
+    ax2 = widget.sc.ax2
+    ax2.scatter(x, y2, marker='4', alpha=alphas[1], color='k', label="Wind")
+    ax2.set_ylabel('m/s', loc='top', color='k', fontweight=font[1], alpha=alphas[1], rotation=0)
+    start2, end2 = ax2.get_ylim()
+    ax2.yaxis.set_ticks(np.arange(0, end2, 1))
+    ax2.spines['top'].set_visible(False)
+    if grids[1]:
+        ax2.grid(grids[1], linestyle='--', color='black')
+
+    line, label = ax1.get_legend_handles_labels()
+    line2, label2 = ax2.get_legend_handles_labels()
+    ax1.legend(line + line2, label + label2, frameon=True, loc='best')
+    widget.sc.ax3.set_visible(False)
+    widget.format_xaxis()
+
+
+def best_time(function, repeats=5):
+    """
+    Runs a function several times and returns the fastest run time in milliseconds
+    """
+
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    app = QApplication(sys.argv)
+    print("%10s %14s %14s %8s %12s" % ("points", "replot (ms)", "artists (ms)", "speedup", "span (ms)"))
+    for point_count in [1000, 10000, 100000]:
+        widget = GraphWidget(synthetic_forecast(point_count))
+        widget.sc.draw()
+
+        def replot():
+            for highlight in highlights:
+                legacy_draw_graph(widget, *highlight)
+                widget.sc.draw()
+
+        def change_artists():
+            for highlight in highlights:
+                widget.draw_graph(*highlight)
+                widget.sc.draw()
+
+        def change_span():
+            for span in [2, 4, 6, 8, 12]:
+                widget.span = span
+                widget.format_xaxis()
+                widget.sc.draw()
+
+        # Per single switch, like pressing a button once
+        replot_ms = best_time(replot) / len(highlights)
+        widget.plot_data()
+        artists_ms = best_time(change_artists) / len(highlights)
+        span_ms = best_time(change_span) / 5
+        print("%10d %14.1f %14.1f %7.1fx %12.1f" % (point_count, replot_ms, artists_ms, replot_ms / artists_ms,
+                                                     span_ms))
+        widget.close()
+    app.quit()
+
+
+if __name__ == "__main__":
+    main()
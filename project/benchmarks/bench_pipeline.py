@@ -0,0 +1,275 @@
+"""
+Benchmark suite of the search pipeline, from the parsing of the responses to the drawn view.
+
+Every stage is run on synthetic payloads scaled from 1x to 100x:
+
+    maintenance       format_maintenance_data, 100 tasks per 1x
+    traffic           format_traffic_messages, 300 nationwide messages per 1x
+    roadCondition     format_road_condition, 50 stations with 5 forecast horizons per 1x
+    fmiParse          the fmiopendata parse of weather_forecast and TimeSeries.from_fmi, 24 hours per 1x
+    currentView       DataVisualization.get_current_view with all of the above
+    drawGraph         GraphWidget.draw_graph of a forecast, including the draw of the canvas
+
+For every stage the median time, the peak of the traced memory and the number of memory blocks allocated by the
+stage and still alive at its end are reported. The memory is traced with tracemalloc in a separate run, so it does
+not slow down the timed runs. Memory allocated by Qt and matplotlib's C++ code is not traced.
+
+The results are stored in benchmarks/results/<label>.json, by default labelled with the current git commit.
+With --compare the results are compared with a stored result and changes over the threshold are marked.
+
+Run from the project folder:
+
+    python3 benchmarks/bench_pipeline.py [--scales 1 10 100] [--repeats 5] [--label LABEL] [--compare LABEL]
+"""
+
+import argparse
+from datetime import datetime, timedelta
+import json
+import os
+import pathlib
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from xml.sax.saxutils import escape
+
+benchmark_folder = pathlib.Path(__file__).resolve().parent
+sys.path.insert(0, str(benchmark_folder.parent / 'controller'))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtWidgets import QApplication
+
+from model.apirequests import (fmi_queries, format_maintenance_data, format_road_condition, format_traffic_messages)
+from model.timeseries import TimeSeries
+from view.data_visualization import DataVisualization
+from view.graph import GraphWidget
+
+from bench_graph_redraw import highlights, synthetic_forecast
+from bench_traffic_messages import synthetic_traffic_messages
+
+results_folder = benchmark_folder / 'results'
+city = "TAMPERE"
+# A change larger than this fraction of the compared result is marked
+regression_threshold = 0.1
+
+
+def synthetic_maintenance(task_count, seed=1):
+    """
+    Generates a maintenance payload
+    :param task_count: int, number of tasks
+    :param seed: int, random seed
+    :return: dict, payload in the format of the digitraffic maintenance API
+    """
+
+    rng = random.Random(seed)
+    tasks = ["PLOUGHING_AND_SLUSH_REMOVAL", "SALTING", "BRUSHING", "LEVELLING_OF_ROAD_SURFACE"]
+    start = datetime(2022, 1, 1)
+    features = []
+    for i in range(task_count):
+        task_start = start + timedelta(minutes=rng.randrange(24 * 60))
+        features.append({"properties": {"tasks": rng.sample(tasks, rng.randint(1, 2)),
+                                        "startTime": task_start.isoformat() + "Z",
+                                        "endTime": (task_start + timedelta(minutes=30)).isoformat() + "Z"}})
+    return {"features": features}
+
+
+def synthetic_road_conditions(station_count, seed=1):
+    """
+    Generates a road condition payload
+    :param station_count: int, number of stations
+    :param seed: int, random seed
+    :return: dict, payload in the format of the digitraffic road condition API
+    """
+
+    rng = random.Random(seed)
+    weather_data = []
+    for station in range(station_count):
+        conditions = []
+        for horizon in ["0h", "2h", "4h", "6h", "12h"]:
+            condition = {"forecastName": horizon, "roadTemperature": "%.1f" % rng.uniform(-10, 2),
+                         "overallRoadCondition": rng.choice(["NORMAL_CONDITION", "POOR_CONDITION"])}
+            if horizon == "0h":
+                condition["daylight"] = rng.random() < 0.5
+            else:
+                condition["forecastConditionReason"] = {"precipitationCondition": rng.choice(["DRY", "SNOW"]),
+                                                        "roadCondition": rng.choice(["DRY", "ICY", "WET"])}
+            conditions.append(condition)
+        weather_data.append({"id": station, "roadConditions": conditions})
+    return {"weatherData": weather_data}
+
+
+def synthetic_fmi_forecast(hour_count, seed=1):
+    """
+    Generates the xml response of the forecast query of weather_forecast
+    :param hour_count: int, number of hourly time steps
+    :param seed: int, random seed
+    :return: bytes, response in the format of the fmi multipointcoverage queries
+    """
+
+    rng = random.Random(seed)
+    start = int(datetime(2022, 1, 1).timestamp())
+    positions = " ".join("61.49911 23.78712 %d" % (start + hour * 3600) for hour in range(hour_count))
+    values = " ".join("%.2f %.2f" % (rng.uniform(-10, 2), rng.uniform(0, 10)) for _ in range(hour_count))
+    fields = "".join('<swe:field name="%s"><swe:Quantity><swe:label>%s</swe:label><swe:uom code="%s"/>'
+                     '</swe:Quantity></swe:field>' % (name, name, unit)
+                     for name, unit in [("temperature", "degC"), ("windspeedms", "m/s")])
+    return ('<wfs:FeatureCollection xmlns:wfs="http://www.opengis.net/wfs/2.0" '
+            'xmlns:gml="http://www.opengis.net/gml/3.2" xmlns:gmlcov="http://www.opengis.net/gmlcov/1.0" '
+            'xmlns:swe="http://www.opengis.net/swe/2.0"><wfs:member>'
+            '<gml:Point gml:id="point-1"><gml:name>%s</gml:name><gml:pos>61.49911 23.78712</gml:pos></gml:Point>'
+            '<gmlcov:positions>%s</gmlcov:positions>'
+            '<gml:doubleOrNilReasonTupleList>%s</gml:doubleOrNilReasonTupleList>'
+            '<swe:DataRecord>%s</swe:DataRecord>'
+            '</wfs:member></wfs:FeatureCollection>' % (escape("Tampere"), positions, values, fields)).encode("utf-8")
+
+
+def parse_fmi_forecast(xml):
+    """
+    The parse of weather_forecast without the request
+    :param xml: bytes, response of the forecast query
+    :return: TimeSeries
+    """
+
+    from fmiopendata.multipoint import MultiPoint
+    return TimeSeries.from_fmi(MultiPoint(xml, fmi_queries[0], timeseries=True).data)
+
+
+def stages(scale):
+    """
+    Prepares the stages at a scale. The payloads are generated here, so that they are not part of the measurements.
+    :param scale: int, scale of the payloads
+    :return: dict, stage name as key and a callable without arguments as value
+    """
+
+    maintenance = synthetic_maintenance(100 * scale)
+    traffic = synthetic_traffic_messages(300 * scale)
+    conditions = synthetic_road_conditions(50 * scale)
+    xml = synthetic_fmi_forecast(24 * scale)
+    forecast = synthetic_forecast(24 * scale)
+
+    settings = {"city": city, "weatherInfo": True, "startDate": None, "endDate": None,
+                "roadInfo": {"roadMaintenance": True, "trafficMessages": True, "roadCondition": True,
+                             "roadCamera": False}}
+    view_data = {"weatherData": forecast,
+                 "roadMaintenance": format_maintenance_data(city, maintenance),
+                 "trafficMessages": format_traffic_messages(city, traffic),
+                 "roadCondition": format_road_condition(city, conditions)}
+
+    def current_view():
+        view = DataVisualization().get_current_view(settings, view_data)
+        view.deleteLater()
+
+    graph = GraphWidget(forecast)
+    graph.sc.draw()
+
+    def draw_graph():
+        for highlight in highlights:
+            graph.draw_graph(*highlight)
+            graph.sc.draw()
+
+    return {"maintenance": lambda: format_maintenance_data(city, maintenance),
+            "traffic": lambda: format_traffic_messages(city, traffic),
+            "roadCondition": lambda: format_road_condition(city, conditions),
+            "fmiParse": lambda: parse_fmi_forecast(xml),
+            "currentView": current_view,
+            "drawGraph": draw_graph}
+
+
+def measure(function, repeats):
+    """
+    Measures a stage
+    :param function: callable without arguments
+    :param repeats: int, number of timed runs
+    :return: dict, median time in milliseconds, peak traced memory in KiB and number of allocated blocks
+    """
+
+    function()
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    result = function()
+    peak = tracemalloc.get_traced_memory()[1]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename") if stat.count_diff > 0)
+    del result
+
+    return {"timeMs": statistics.median(times) * 1000, "peakKiB": peak / 1024, "blocks": blocks}
+
+
+def git_label():
+    """
+    :return: str, short hash of the current git commit, or "local" outside a git repository
+    """
+
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=str(benchmark_folder), check=True,
+                              capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "local"
+
+
+def compare(results, previous):
+    """
+    Prints the change of every measurement compared to a previous result
+    :param results: dict, stage and scale as keys, see main
+    :param previous: dict, stored results in the same format
+    :return: None
+    """
+
+    print()
+    print("Compared with %s (* change over %d%%)" % (previous["label"], regression_threshold * 100))
+    print("%14s %6s %12s %12s %12s" % ("stage", "scale", "time", "peak", "blocks"))
+    for stage, scales in results["stages"].items():
+        for scale, measurement in scales.items():
+            old = previous["stages"].get(stage, {}).get(scale)
+            if old is None:
+                continue
+            changes = []
+            for key in ["timeMs", "peakKiB", "blocks"]:
+                change = (measurement[key] - old[key]) / old[key] if old[key] else 0.0
+                changes.append("%+.0f%%%s" % (change * 100, "*" if abs(change) > regression_threshold else ""))
+            print("%14s %5sx %12s %12s %12s" % (stage, scale, *changes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark suite of the search pipeline")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--label", default=None, help="name of the stored results, default is the git commit")
+    parser.add_argument("--compare", default=None, help="label of stored results to compare with")
+    arguments = parser.parse_args()
+
+    app = QApplication(sys.argv[:1])
+    label = arguments.label or git_label()
+    results = {"label": label, "date": datetime.now().isoformat(timespec="seconds"), "python": sys.version.split()[0],
+               "stages": {}}
+
+    print("%14s %6s %12s %12s %10s" % ("stage", "scale", "time (ms)", "peak (KiB)", "blocks"))
+    for scale in arguments.scales:
+        for stage, function in stages(scale).items():
+            measurement = measure(function, arguments.repeats)
+            results["stages"].setdefault(stage, {})[str(scale)] = measurement
+            print("%14s %5dx %12.2f %12.1f %10d" % (stage, scale, measurement["timeMs"], measurement["peakKiB"],
+                                                    measurement["blocks"]))
+
+    results_folder.mkdir(exist_ok=True)
+    path = results_folder / (label + ".json")
+    path.write_text(json.dumps(results, indent=1))
+    print("Stored in " + str(path))
+
+    if arguments.compare:
+        compare(results, json.loads((results_folder / (arguments.compare + ".json")).read_text()))
+    app.quit()
+
+
+if __name__ == "__main__":
+    main()
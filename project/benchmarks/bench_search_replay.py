@@ -0,0 +1,146 @@
+"""
+Throughput and latency of the search path on recorded responses.
+
+First record the responses of the real APIs once, with network:
+
+    python3 benchmarks/bench_search_replay.py record [--fixtures FOLDER]
+
+Then replay them as many times as needed, without network:
+
+    python3 benchmarks/bench_search_replay.py replay [--fixtures FOLDER] [--latency SECONDS] [--scale N] [--runs N]
+
+A search is the today search and a week of history of every city with all data sources, run concurrently like the
+fetch engine runs them. Every run starts with an empty response cache, so every request goes through the transport.
+The replay reports the median and 95th percentile latency of every source, the median time of a search and the
+number of searches per second. --latency adds a delay to every request and --scale repeats the items of the json
+payloads, see model/replay.py.
+
+Run from the project folder.
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import pathlib
+import statistics
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent / 'controller'))
+
+from model import apirequests, cache, replay
+from model.http_client import http_client
+from model.time_window import TimeWindow, now
+
+default_fixtures = pathlib.Path(__file__).resolve().parent / 'fixtures'
+history_days = 7
+
+
+def searches():
+    """
+    :return: list of dicts, the requests of every search, source name as key and a callable as value
+    """
+
+    today = now()
+    history = TimeWindow.days(today - timedelta(days=history_days), today - timedelta(days=1))
+    return [apirequests.search_requests(city, window)
+            for city in apirequests.weather_camera_ids for window in [None, history]]
+
+
+def run_search(executor, requests):
+    """
+    Runs the requests of a search concurrently
+    :param executor: ThreadPoolExecutor
+    :param requests: dict, source name as key and a callable as value
+    :return: dict, source name as key and the latency in seconds or None for a failed request as value, and the
+    time of the search in seconds
+    """
+
+    def timed(request):
+        start = time.perf_counter()
+        try:
+            request()
+        except Exception:
+            return None
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    futures = {source: executor.submit(timed, request) for source, request in requests.items()}
+    latencies = {source: future.result() for source, future in futures.items()}
+    return latencies, time.perf_counter() - start
+
+
+def run_all(runs):
+    """
+    Runs every search several times, each run with an empty response cache
+    :param runs: int, number of runs
+    :return: dict, source name as key and list of latencies as value, list of search times and the number of failed
+    requests
+    """
+
+    latencies = {}
+    failures = 0
+    search_times = []
+    with ThreadPoolExecutor(max_workers=8) as executor, tempfile.TemporaryDirectory() as folder:
+        for run in range(runs):
+            cache.response_cache = cache.ResponseCache(pathlib.Path(folder) / ("run%d.sqlite" % run))
+            apirequests.camera_images.clear()
+            http_client.conditional_responses.clear()
+            for requests in searches():
+                source_latencies, search_time = run_search(executor, requests)
+                search_times.append(search_time)
+                for source, latency in source_latencies.items():
+                    if latency is None:
+                        failures += 1
+                    else:
+                        latencies.setdefault(source, []).append(latency)
+    return latencies, search_times, failures
+
+
+def percentile(values, fraction):
+    """
+    :return: float, value at the fraction of the sorted values
+    """
+
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of the search path on recorded responses")
+    parser.add_argument("mode", choices=["record", "replay"])
+    parser.add_argument("--fixtures", type=pathlib.Path, default=default_fixtures)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every replayed request")
+    parser.add_argument("--scale", type=int, default=1, help="repeats of the items of the json payloads")
+    parser.add_argument("--runs", type=int, default=5)
+    arguments = parser.parse_args()
+
+    if arguments.mode == "record":
+        replay.record(arguments.fixtures)
+        try:
+            failures = run_all(1)[2]
+        finally:
+            replay.uninstall()
+        print("Recorded %d responses into %s, %d requests failed" %
+              (len(list(arguments.fixtures.glob("*.body"))), arguments.fixtures, failures))
+        return
+
+    adapter = replay.replay(arguments.fixtures, arguments.latency, arguments.scale)
+    try:
+        start = time.perf_counter()
+        latencies, search_times, failures = run_all(arguments.runs)
+        elapsed = time.perf_counter() - start
+    finally:
+        replay.uninstall()
+
+    print("%16s %10s %10s" % ("source", "p50 (ms)", "p95 (ms)"))
+    for source, values in latencies.items():
+        print("%16s %10.1f %10.1f" % (source, percentile(values, 0.5) * 1000, percentile(values, 0.95) * 1000))
+    print("%d searches, %d requests, %d failed, median search %.1f ms, %.1f searches/s" %
+          (len(search_times), adapter.request_count, failures, statistics.median(search_times) * 1000,
+           len(search_times) / elapsed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Startup time of the application.
+
+Starts the application in a new interpreter several times and reports the
+median of each stage:
+
+    interpreter   from starting the process until the script runs
+    imports       importing main_window
+    window        creating UiMainWindow
+    first paint   from window.show() until the window has been painted
+    total         from starting the process until the first paint
+    deferred      importing the modules of warm_up_imports afterwards
+
+The deferred imports run in a background thread in the application, here
+they are measured on their own after the first paint.
+
+Run from the project folder:
+
+    python3 benchmarks/bench_startup.py [runs]
+"""
+
+import json
+import os
+import pathlib
+import statistics
+import subprocess
+import sys
+import time
+
+project_folder = pathlib.Path(__file__).resolve().parent.parent
+stages = ["interpreter", "imports", "window", "first paint", "total", "deferred"]
+
+
+def child():
+    """
+    Starts the application once and prints the times of the stages in milliseconds as json
+    """
+
+    script_start = time.perf_counter()
+    sys.path.insert(0, str(project_folder / 'controller'))
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+    import main_window
+    from PyQt5 import QtCore
+    from PyQt5.QtWidgets import QApplication
+    imported = time.perf_counter()
+
+    app = QApplication(sys.argv[:1])
+    window = main_window.UiMainWindow()
+    created = time.perf_counter()
+
+    painted = []
+
+    class PaintFilter(QtCore.QObject):
+        def eventFilter(self, watched, event):
+            if event.type() == QtCore.QEvent.Paint and not painted:
+                painted.append(time.perf_counter())
+                QtCore.QTimer.singleShot(0, app.quit)
+            return False
+
+    paint_filter = PaintFilter()
+    window.installEventFilter(paint_filter)
+    window.show()
+    app.exec_()
+
+    deferred_start = time.perf_counter()
+    main_window.warm_up_imports()
+    deferred_end = time.perf_counter()
+    window.fetch_engine.shutdown()
+
+    print(json.dumps({"scriptStart": script_start,
+                      "imports": (imported - script_start) * 1000,
+                      "window": (created - imported) * 1000,
+                      "first paint": (painted[0] - created) * 1000,
+                      "deferred": (deferred_end - deferred_start) * 1000,
+                      "paintedAt": painted[0]}))
+
+
+def run_once():
+    """
+    Runs the child in a new interpreter
+    :return: dict, stage as key and time in milliseconds as value
+    """
+
+    # perf_counter is system wide on Linux and macOS, so the child's clock can be compared with the start time
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, __file__, "--child"], cwd=str(project_folder), check=True,
+                            capture_output=True, text=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result["interpreter"] = (result["scriptStart"] - start) * 1000
+    result["total"] = (result["paintedAt"] - start) * 1000
+    return result
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    results = [run_once() for _ in range(runs)]
+    print("%12s %12s" % ("stage", "median (ms)"))
+    for stage in stages:
+        print("%12s %12.1f" % (stage, statistics.median(result[stage] for result in results)))
+
+
+if __name__ == "__main__":
+    if "--child" in sys.argv:
+        child()
+    else:
+        main()
@@ -0,0 +1,114 @@
+"""
+Benchmark of the traffic message city filter.
+
+Compares the spatial index of format_traffic_messages_cities against the
+original nested loop of format_traffic_messages on synthetic nationwide
+payloads. The original loop compared a longitude against the max latitude,
+so the number of matches can differ.
+
+Run from the project folder:
+
+    python3 benchmarks/bench_traffic_messages.py
+"""
+
+import pathlib
+import random
+import sys
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent / 'controller'))
+
+from model.apirequests import digitrafi_coordinates, format_traffic_messages_cities
+
+
+def synthetic_traffic_messages(feature_count, points_per_line=20, seed=1):
+    """
+    Generates a nationwide traffic message payload with MultiLineString, Point and missing geometries
+    :param feature_count: int, number of features
+    :param points_per_line: int, number of coordinate pairs in each line
+    :param seed: int, random seed
+    :return: dict, payload in the format of the digitraffic traffic message API
+    """
+
+    rng = random.Random(seed)
+    features = []
+    for i in range(feature_count):
+        lon = rng.uniform(20.0, 31.0)
+        lat = rng.uniform(59.8, 69.0)
+        kind = rng.random()
+        if kind < 0.1:
+            geometry = None
+        elif kind < 0.3:
+            geometry = {"type": "Point", "coordinates": [lon, lat]}
+        else:
+            lines = []
+            for _ in range(rng.randint(1, 3)):
+                lines.append([[lon + 0.005 * j, lat + 0.003 * j] for j in range(points_per_line)])
+            geometry = {"type": "MultiLineString", "coordinates": lines}
+        features.append({"geometry": geometry,
+                         "properties": {"situationType": "TRAFFIC_ANNOUNCEMENT",
+                                        "announcements": [{"features": [{"name": "Feature %d" % i}],
+                                                           "comment": "Comment %d" % i}]}})
+    return {"features": features}
+
+
+def legacy_format_traffic_messages(city, all_traffic_messages):
+    """
+    The original nested loop of format_traffic_messages, kept for comparison
+    """
+
+    coordinates = digitrafi_coordinates[city].split(",")
+    coordinates = [float(c) for c in coordinates]
+    messages = {"situationType": [], "name": [], "comment": []}
+
+    for feature in all_traffic_messages['features']:
+        if feature['geometry'] != None:
+            for coords in feature['geometry']['coordinates']:
+                if type(coords) == list:
+                    for cordPair in coords:
+                        if len(cordPair) == 2:
+                            if coordinates[0] < cordPair[0] < coordinates[2] and \
+                                    cordPair[1] > coordinates[1] and cordPair[0] < coordinates[3]:
+                                messages["situationType"].append(feature['properties']['situationType'])
+                                messages["name"].append(feature['properties']['announcements'][0]['features'][0]['name'])
+                                messages["comment"].append(feature['properties']['announcements'][0]['comment'])
+                                break
+
+    return {city: messages}
+
+
+def best_time(function, repeats=5):
+    """
+    Runs a function several times and returns the fastest run time in milliseconds and the last result
+    """
+
+    best = float("inf")
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+
+def main():
+    cities = list(digitrafi_coordinates.keys())
+    print("%10s %14s %14s %8s %16s" % ("features", "loop (ms)", "index (ms)", "speedup", "matches l/i"))
+    for feature_count in [1000, 10000, 50000]:
+        payload = synthetic_traffic_messages(feature_count)
+        # The original loop crashes on Point geometries, so it only gets the line features
+        lines_only = {"features": [f for f in payload["features"]
+                                   if f["geometry"] is None or f["geometry"]["type"] != "Point"]}
+
+        loop_ms, loop_result = best_time(
+            lambda: [legacy_format_traffic_messages(city, lines_only) for city in cities])
+        index_ms, index_result = best_time(lambda: format_traffic_messages_cities(cities, lines_only))
+
+        loop_matches = sum(len(r[city]["name"]) for r, city in zip(loop_result, cities))
+        index_matches = sum(len(index_result[city]["name"]) for city in cities)
+        print("%10d %14.1f %14.1f %7.1fx %16s" % (feature_count, loop_ms, index_ms, loop_ms / index_ms,
+                                                   "%d/%d" % (loop_matches, index_matches)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+This class implements the concurrent fetch engine of the main_window.
+
+Every data source of a search is fetched in its own worker thread so that the GUI thread is never blocked by
+network requests. Results are delivered back to the GUI thread with Qt signals as soon as each source finishes,
+which allows the view to be filled in progressively.
+
+Each search gets an id. A search can be cancelled, after which its results are dropped, so a slow response of an
+old search can never overwrite newer data.
+
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from PyQt5 import QtCore
+from PyQt5.QtCore import QObject, pyqtSignal
+
+
+class FetchEngine(QObject):
+
+    # search id, source name, fetched data
+    source_finished = pyqtSignal(int, str, object)
+    # search id, source name, error message
+    source_failed = pyqtSignal(int, str, str)
+    # search id
+    search_finished = pyqtSignal(int)
+
+    def __init__(self, max_workers=8):
+        super(FetchEngine, self).__init__()
+
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="fetch")
+        self.last_search_id = 0
+        self.pending = {}
+
+        # Results are emitted from the worker threads and handled here in the GUI thread.
+        # A request that finishes before its callback is added emits from the GUI thread, so the connections are
+        # always queued to keep the delivery asynchronous. Receivers should connect the same way.
+        self.source_finished.connect(self.source_done, QtCore.Qt.QueuedConnection)
+        self.source_failed.connect(self.source_done, QtCore.Qt.QueuedConnection)
+
+
+    def start_search(self, requests):
+        """
+        Dispatches all requests of a search to the worker threads
+        :param requests: dict, source name as key and a callable without arguments as value
+        :return: int, id of the started search
+        """
+
+        self.last_search_id += 1
+        search_id = self.last_search_id
+        if not requests:
+            return search_id
+
+        self.pending[search_id] = set(requests.keys())
+
+        for source, request in requests.items():
+            future = self.executor.submit(request)
+            future.add_done_callback(lambda f, source=source: self.request_done(search_id, source, f))
+
+        return search_id
+
+
+    def cancel_search(self, search_id):
+        """
+        Cancels a search. Results of requests that are still running are dropped.
+        :param search_id: int, id of the search
+        :return: None
+        """
+
+        self.pending.pop(search_id, None)
+
+
+    def is_active(self, search_id):
+        """
+        Tells if the search still has requests running
+        :param search_id: int, id of the search
+        :return: bool
+        """
+
+        return search_id in self.pending
+
+
+    def request_done(self, search_id, source, future):
+        """
+        Called in the worker thread when a request is done. Emits the result as a signal, which Qt queues to the
+        GUI thread.
+        :param search_id: int, id of the search the request belongs to
+        :param source: str, name of the data source
+        :param future: Future, finished request
+        :return: None
+        """
+
+        if not self.is_active(search_id) or future.cancelled():
+            return
+
+        error = future.exception()
+        if error is None:
+            self.source_finished.emit(search_id, source, future.result())
+        else:
+            self.source_failed.emit(search_id, source, str(error))
+
+
+    def source_done(self, search_id, source, _result):
+        """
+        Marks a source of a search done and emits search_finished when all sources of the search are done
+        :param search_id: int, id of the search
+        :param source: str, name of the data source
+        :param _result: data or error message of the source, not used
+        :return: None
+        """
+
+        if not self.is_active(search_id):
+            return
+
+        self.pending[search_id].discard(source)
+        if not self.pending[search_id]:
+            del self.pending[search_id]
+            self.search_finished.emit(search_id)
+
+
+    def shutdown(self):
+        """
+        Stops the worker threads without waiting for unfinished requests
+        :return: None
+        """
+
+        self.pending.clear()
+        self.executor.shutdown(wait=False, cancel_futures=True)
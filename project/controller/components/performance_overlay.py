@@ -0,0 +1,44 @@
+"""
+This class implements the performance overlay in the status bar of the main_window.
+
+It shows the rolling median and 95th percentile duration of the stages of every data source, see instrumentation.py.
+The main_window passes the statistics to the overlay while it is visible.
+
+"""
+
+from PyQt5 import QtCore
+from PyQt5.QtWidgets import QLabel
+
+# Stages shown in the overlay in this order, the other stages are only written to the log
+overlay_stages = ["search", "layout", "request", "network", "download", "decode", "parse", "view", "render"]
+
+
+class PerformanceOverlay(QLabel):
+
+    def __init__(self):
+        super(PerformanceOverlay, self).__init__()
+
+        self.setTextFormat(QtCore.Qt.PlainText)
+        self.setText("No timings yet")
+
+
+    def set_statistics(self, statistics):
+        """
+        Shows the statistics of the stages
+        :param statistics: dict, (source, stage) as key and a dict with the count, p50 and p95 in milliseconds as value
+        :return: None
+        """
+
+        sources = {}
+        for (source, stage), values in statistics.items():
+            if stage in overlay_stages:
+                sources.setdefault(source, []).append((overlay_stages.index(stage), stage, values))
+        if not sources:
+            return
+
+        parts = []
+        for source in sorted(sources):
+            stages = ", ".join("%s %.0f/%.0f" % (stage, values["p50"], values["p95"])
+                               for _, stage, values in sorted(sources[source]))
+            parts.append(source + ": " + stages)
+        self.setText("p50/p95 ms   " + "   |   ".join(parts))
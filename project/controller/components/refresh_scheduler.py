@@ -0,0 +1,188 @@
+"""
+This class implements the automatic refresh of the today tab of the main_window.
+
+Every data source of the today search is fetched again on its own interval, see refresh_intervals. The requests
+are run in the fetch engine, so the GUI thread is never blocked. The requests of the model are conditional where the
+API supports it (ETag and If-Modified-Since, see http_client.py) and reuse the response cache, so an unchanged source
+costs little.
+
+A fingerprint of every result is compared with the fingerprint of the data already shown, and only the sources whose
+data has changed are emitted. The receiver can then update the existing view in place instead of rebuilding the tab.
+
+"""
+
+import hashlib
+import pickle
+
+from PyQt5 import QtCore
+from PyQt5.QtCore import QObject, pyqtSignal
+
+# Refresh interval of every data source in seconds. The intervals are not shorter than the ttls of the response
+# cache, see cache.py, since a refresh within the ttl would only return the cached data. Sources that are not listed,
+# like the road maintenance, are refreshed only on demand with refresh_all.
+refresh_intervals = {"roadCondition": 5 * 60,
+                     "roadCamera": 5 * 60,
+                     "trafficMessages": 5 * 60,
+                     "weatherData": 60 * 60}
+
+
+def fingerprint(data):
+    """
+    Identifies the content of fetched data, so that unchanged data can be recognized without comparing it
+    :param data: data of a source from the model, or a camera image from decode_camera_image
+    :return: hashable fingerprint of the data
+    """
+
+    if isinstance(data, dict) and "imageKey" in data:
+        # The camera image is identified by its station, preset and timestamp
+        return data["imageKey"]
+    return hashlib.sha256(pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)).hexdigest()
+
+
+class RefreshScheduler(QObject):
+
+    # source name, changed data
+    source_changed = pyqtSignal(str, object)
+
+    def __init__(self, fetch_engine, intervals=None):
+        """
+        :param fetch_engine: FetchEngine, engine that runs the requests
+        :param intervals: dict or None, source name as key and refresh interval in seconds as value. Default None uses
+        refresh_intervals.
+        """
+
+        super(RefreshScheduler, self).__init__()
+
+        self.fetch_engine = fetch_engine
+        self.intervals = refresh_intervals if intervals is None else intervals
+        # source name as key and the callable of the model as value
+        self.requests = {}
+        # fingerprint of the data shown, source name as key
+        self.fingerprints = {}
+        # id of the running refresh of a source, source name as key
+        self.running = {}
+        self.timers = {}
+
+        self.fetch_engine.source_finished.connect(self.refresh_finished, QtCore.Qt.QueuedConnection)
+        self.fetch_engine.source_failed.connect(self.refresh_failed, QtCore.Qt.QueuedConnection)
+
+
+    def start(self, requests):
+        """
+        Starts refreshing the sources of a search. Replaces the sources of the previous search.
+        :param requests: dict, source name as key and a callable without arguments as value, see fetch_plan
+        :return: None
+        """
+
+        self.stop()
+        self.requests = dict(requests)
+        for source in self.requests:
+            if source not in self.intervals:
+                continue
+            timer = QtCore.QTimer(self)
+            timer.setSingleShot(True)
+            timer.setInterval(int(self.intervals[source] * 1000))
+            timer.timeout.connect(lambda source=source: self.refresh(source))
+            self.timers[source] = timer
+            timer.start()
+
+
+    def stop(self):
+        """
+        Stops refreshing. Results of refreshes that are still running are dropped.
+        :return: None
+        """
+
+        for timer in self.timers.values():
+            timer.stop()
+            timer.deleteLater()
+        for search_id in self.running.values():
+            self.fetch_engine.cancel_search(search_id)
+        self.requests = {}
+        self.fingerprints = {}
+        self.running = {}
+        self.timers = {}
+
+
+    def set_shown(self, source, data):
+        """
+        Records the data shown in the view, so that a refresh returning the same data is not emitted. The interval of
+        the source starts again.
+        :param source: str, name of the data source
+        :param data: data of the source
+        :return: None
+        """
+
+        if source not in self.requests:
+            return
+        self.fingerprints[source] = fingerprint(data)
+        if source in self.timers:
+            self.timers[source].start()
+
+
+    def refresh(self, source):
+        """
+        Fetches a source again in the fetch engine unless it is already being fetched
+        :param source: str, name of the data source
+        :return: None
+        """
+
+        if source not in self.requests or source in self.running:
+            return
+
+        request = self.requests[source]
+
+        def fetch():
+            # The fingerprint is computed in the fetch thread as well
+            data = request()
+            return fingerprint(data), data
+
+        self.running[source] = self.fetch_engine.start_search({source: fetch})
+
+
+    def refresh_all(self):
+        """
+        Fetches every source of the search again, including the sources that are refreshed only on demand
+        :return: None
+        """
+
+        for source in self.requests:
+            self.refresh(source)
+
+
+    def refresh_finished(self, search_id, source, result):
+        """
+        Emits the data of a finished refresh if it has changed
+        :param search_id: int, id of the search
+        :param source: str, name of the data source
+        :param result: tuple, fingerprint and data of the source
+        :return: None
+        """
+
+        if self.running.get(source) != search_id:
+            return
+        del self.running[source]
+        if source in self.timers:
+            self.timers[source].start()
+
+        data_fingerprint, data = result
+        if self.fingerprints.get(source) == data_fingerprint:
+            return
+        self.fingerprints[source] = data_fingerprint
+        self.source_changed.emit(source, data)
+
+
+    def refresh_failed(self, search_id, source, _message):
+        """
+        Keeps the previous data when a refresh fails, the source is tried again after its interval
+        :param search_id: int, id of the search
+        :param source: str, name of the data source
+        :param _message: str, error message, not used
+        :return: None
+        """
+
+        if self.running.get(source) != search_id:
+            return
+        del self.running[source]
+        if source in self.timers:
+            self.timers[source].start()
@@ -81,6 +81,10 @@ class SidePanel(QWidget):
         self.city_selection_combo_box.addItems(["Tampere", "Helsinki", "Oulu", "Turku", "Lappeenranta"])
         self.city_selection_combo_box.currentIndexChanged.connect(self.city_selection_combo_box_changed)
         city_selection_layout.addWidget(self.city_selection_combo_box)
+        self.preload_cities_checkbox = QtWidgets.QCheckBox("Preload all cities")
+        self.preload_cities_checkbox.setToolTip("Fetches the selected data of every city on search, "
+                                                "so that switching the city is instant")
+        city_selection_layout.addWidget(self.preload_cities_checkbox)
 
         self.city_selection_widget.setLayout(city_selection_layout)
         side_panel_items_layout.addWidget(self.city_selection_widget)
@@ -209,9 +213,32 @@ class SidePanel(QWidget):
         side_panel_items_layout.addWidget(self.search_data_widget)
 
         load_timeline_layout = QtWidgets.QVBoxLayout()
+        load_timeline_label = QtWidgets.QLabel("Saved timelines")
+        load_timeline_label.setFont(font)
+        load_timeline_label.setContentsMargins(0, 0, 0, 6)
+        load_timeline_layout.addWidget(load_timeline_label)
+        self.timeline_city_combo_box = QtWidgets.QComboBox()
+        self.timeline_city_combo_box.addItems(["All cities", "Tampere", "Helsinki", "Oulu", "Turku", "Lappeenranta"])
+        load_timeline_layout.addWidget(self.timeline_city_combo_box)
+        self.timeline_dates_checkbox = QtWidgets.QCheckBox("Overlapping dates")
+        load_timeline_layout.addWidget(self.timeline_dates_checkbox)
+        timeline_dates_layout = QtWidgets.QHBoxLayout()
+        self.timeline_start_date_edit = QtWidgets.QDateEdit(QtCore.QDate.currentDate().addDays(-7))
+        self.timeline_start_date_edit.setCalendarPopup(True)
+        timeline_dates_layout.addWidget(self.timeline_start_date_edit)
+        self.timeline_end_date_edit = QtWidgets.QDateEdit(QtCore.QDate.currentDate())
+        self.timeline_end_date_edit.setCalendarPopup(True)
+        timeline_dates_layout.addWidget(self.timeline_end_date_edit)
+        load_timeline_layout.addLayout(timeline_dates_layout)
+        self.timeline_list = QtWidgets.QListWidget()
+        self.timeline_list.setMinimumHeight(200)
+        self.timeline_list.setToolTip("Double-click a timeline to show it on the empty side of the compare tab, or "
+                                      "in place of the timeline that was not loaded last")
+        load_timeline_layout.addWidget(self.timeline_list)
+
         load_button_layout_1 = QtWidgets.QHBoxLayout()
         load_button_layout_1.setSpacing(18)
-        select_timeline_label_1 = QtWidgets.QLabel("Load timeline")
+        select_timeline_label_1 = QtWidgets.QLabel("Show on the left")
         select_timeline_label_1.setAlignment(
             QtCore.Qt.AlignRight | QtCore.Qt.AlignTrailing | QtCore.Qt.AlignVCenter)
         load_button_layout_1.addWidget(select_timeline_label_1)
@@ -222,7 +249,7 @@ class SidePanel(QWidget):
         load_timeline_layout.addLayout(load_button_layout_1)
         load_button_layout_2 = QtWidgets.QHBoxLayout()
         load_button_layout_2.setSpacing(18)
-        select_timeline_label_2 = QtWidgets.QLabel("Load timeline")
+        select_timeline_label_2 = QtWidgets.QLabel("Show on the right")
         select_timeline_label_2.setAlignment(
             QtCore.Qt.AlignRight | QtCore.Qt.AlignTrailing | QtCore.Qt.AlignVCenter)
         load_button_layout_2.addWidget(select_timeline_label_2)
@@ -376,6 +403,51 @@ class SidePanel(QWidget):
         }
 
 
+    def get_timeline_filter(self):
+        """
+        Collects the search of the saved timelines list
+        :return: dict, city and startDate and endDate in ISO format, None for no filtering
+        """
+
+        city = self.timeline_city_combo_box.currentText() if self.timeline_city_combo_box.currentIndex() > 0 else None
+        dates = self.timeline_dates_checkbox.isChecked()
+        return {
+            "city": city,
+            "startDate": self.timeline_start_date_edit.date().toString(QtCore.Qt.ISODate) if dates else None,
+            "endDate": self.timeline_end_date_edit.date().toString(QtCore.Qt.ISODate) if dates else None,
+        }
+
+
+    def set_timelines(self, timelines):
+        """
+        Shows the found timelines in the saved timelines list, the selection is kept if possible
+        :param timelines: list of dicts with the name, city, startDate, endDate, sources and size of a timeline
+        :return:
+        """
+
+        selected = self.get_selected_timeline()
+        self.timeline_list.clear()
+        for timeline in timelines:
+            item = QtWidgets.QListWidgetItem(
+                timeline["city"] + " " + timeline["startDate"] + " - " + timeline["endDate"])
+            item.setData(QtCore.Qt.UserRole, timeline["name"])
+            item.setToolTip(timeline["name"] + "\n" + (", ".join(timeline["sources"]) or "No data") +
+                            "\n" + str(round(timeline["size"] / 1024)) + " kB")
+            self.timeline_list.addItem(item)
+            if timeline["name"] == selected:
+                self.timeline_list.setCurrentItem(item)
+
+
+    def get_selected_timeline(self):
+        """
+        Returns the timeline selected in the saved timelines list
+        :return: str, file name of the timeline or None if nothing is selected
+        """
+
+        item = self.timeline_list.currentItem()
+        return item.data(QtCore.Qt.UserRole) if item is not None else None
+
+
     def set_favourite_settings(self):
         """
         Saves settings as favourite in json format
@@ -39,6 +39,7 @@ class ViewPanel(QWidget):
         self.compare_tab_scroll_area = QtWidgets.QScrollArea()
         self.compare_tab_content_left = QtWidgets.QWidget()
         self.compare_tab_content_right = QtWidgets.QWidget()
+        self.compare_tab_content_diff = None
 
         self.setup_view_panel()
 
@@ -116,12 +117,37 @@ class ViewPanel(QWidget):
         elif side == "right":
             self.compare_tab_content_right = visualizations
 
+        self.layout_compare_tab()
+
+
+    def set_compare_diff_content(self, comparison):
+        """
+        Sets the comparison of the two timelines below them in the compare tab.
+        :param comparison: QWidget or None, comparison of the timelines
+        :return:
+        """
+
+        self.compare_tab_content_diff = comparison
+        self.layout_compare_tab()
+
+
+    def layout_compare_tab(self):
+        """
+        Lays out the left and right timelines side by side and the comparison below them.
+        :return:
+        """
+
         compare_layout = QtWidgets.QHBoxLayout()
         compare_layout.addWidget(self.compare_tab_content_left)
         compare_layout.addWidget(self.compare_tab_content_right)
 
+        content_layout = QtWidgets.QVBoxLayout()
+        content_layout.addLayout(compare_layout)
+        if self.compare_tab_content_diff is not None:
+            content_layout.addWidget(self.compare_tab_content_diff)
+
         content = QtWidgets.QWidget()
-        content.setLayout(compare_layout)
+        content.setLayout(content_layout)
 
         self.compare_tab_scroll_area.setWidget(content)
 
@@ -132,14 +158,14 @@ class ViewPanel(QWidget):
         :return: QWidget, compare tab
         """
 
-        scroll_area = QtWidgets.QScrollArea()
-        scroll_area.setFrameShape(QtWidgets.QFrame.NoFrame)
-        scroll_area.setGeometry(QtCore.QRect(0, 0, 1300, 900))
-        scroll_area.setSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Expanding)
+        self.compare_tab_scroll_area.setFrameShape(QtWidgets.QFrame.NoFrame)
+        self.compare_tab_scroll_area.setGeometry(QtCore.QRect(0, 0, 1300, 900))
+        self.compare_tab_scroll_area.setSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Expanding)
+        self.compare_tab_scroll_area.setWidgetResizable(True)
 
         scroll_area_layout = QtWidgets.QHBoxLayout()
         scroll_area_layout.setContentsMargins(0, 0, 0, 0)
-        scroll_area_layout.addWidget(scroll_area)
+        scroll_area_layout.addWidget(self.compare_tab_scroll_area)
         self.compare_tab = QtWidgets.QWidget()
         self.compare_tab.setLayout(scroll_area_layout)
 
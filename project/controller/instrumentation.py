@@ -0,0 +1,161 @@
+"""
+This file implements the timing instrumentation of the application.
+
+It is shared by the model, the view and the controller like a logging facility, and it does not depend on either of
+them.
+
+The time of every stage of a search is recorded as a span: the request of a data source, the network wait inside
+it, the parsing of the response and the rendering of the view. A span belongs to a data source, which is inherited
+by the spans started inside it in the same thread. The latest spans of every source and stage are kept for rolling
+percentiles, and every span can be written as a line of json into a log file.
+"""
+
+from collections import deque
+import contextlib
+import functools
+import json
+import threading
+import time
+
+# Number of the latest spans of every source and stage used for the percentiles
+rolling_window = 100
+
+
+class Instrumentation:
+
+    def __init__(self, window=rolling_window):
+        """
+        :param window: int, number of the latest spans of every source and stage used for the percentiles
+        """
+
+        self.window = window
+        # (source, stage) as key and a deque of durations in milliseconds as value
+        self.durations = {}
+        self.sink = None
+        self.lock = threading.Lock()
+        self.context = threading.local()
+
+
+    def current_source(self):
+        """
+        :return: str or None, data source of the innermost span of the current thread
+        """
+
+        return getattr(self.context, "source", None)
+
+
+    @contextlib.contextmanager
+    def span(self, stage, source=None, **fields):
+        """
+        Times a stage. The caller can add fields, like the number of received bytes, to the yielded dict.
+        :param stage: str, name of the stage, like request, network, parse or render
+        :param source: str or None, name of the data source. Default None uses the source of the enclosing span.
+        :param fields: values recorded with the span
+        :return: context manager yielding a dict of the recorded fields
+        """
+
+        previous = self.current_source()
+        source = source or previous or "unknown"
+        self.context.source = source
+        start = time.perf_counter()
+        try:
+            yield fields
+        finally:
+            duration = (time.perf_counter() - start) * 1000
+            self.context.source = previous
+            self.record(source, stage, duration, **fields)
+
+
+    def record(self, source, stage, duration, **fields):
+        """
+        Records a span that has been timed elsewhere
+        :param source: str, name of the data source
+        :param stage: str, name of the stage
+        :param duration: float, duration in milliseconds
+        :param fields: values recorded with the span
+        :return: None
+        """
+
+        entry = {"time": time.time(), "source": source, "stage": stage, "durationMs": round(duration, 3),
+                 "thread": threading.current_thread().name}
+        entry.update(fields)
+        with self.lock:
+            key = (source, stage)
+            if key not in self.durations:
+                self.durations[key] = deque(maxlen=self.window)
+            self.durations[key].append(duration)
+            if self.sink is not None:
+                self.sink.write(json.dumps(entry, default=str) + "\n")
+                self.sink.flush()
+
+
+    def timed(self, stage, source=None):
+        """
+        Decorator that records every call of a function as a span
+        :param stage: str, name of the stage
+        :param source: str or None, name of the data source, see span
+        :return: decorated function
+        """
+
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.span(stage, source, function=function.__name__):
+                    return function(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+
+    def open_sink(self, path):
+        """
+        Starts writing every span as a line of json into a file
+        :param path: pathlib.Path, log file, appended to
+        :return: None
+        """
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self.lock:
+            if self.sink is not None:
+                self.sink.close()
+            self.sink = open(path, "a", encoding="utf-8")
+
+
+    def close_sink(self):
+        """
+        Stops writing the spans into the log file
+        :return: None
+        """
+
+        with self.lock:
+            if self.sink is not None:
+                self.sink.close()
+                self.sink = None
+
+
+    def statistics(self):
+        """
+        Rolling percentiles of the latest spans
+        :return: dict, (source, stage) as key and a dict with the count, p50 and p95 in milliseconds as value
+        """
+
+        with self.lock:
+            samples = {key: sorted(durations) for key, durations in self.durations.items()}
+        return {key: {"count": len(values), "p50": percentile(values, 0.5), "p95": percentile(values, 0.95)}
+                for key, values in samples.items()}
+
+
+def percentile(ordered, fraction):
+    """
+    :param ordered: list, sorted values
+    :param fraction: float, between 0 and 1
+    :return: float, value at the fraction of the values, the nearest rank
+    """
+
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+instrumentation = Instrumentation()
+span = instrumentation.span
+timed = instrumentation.timed
@@ -6,17 +6,38 @@ It's responsible for the communication between the view and the model.
 It's the only class that has access to the model and the view.
 
 """
-import os
+import gc
+import pathlib
 import sys
-from PyQt5 import QtCore, QtWidgets
-from PyQt5.QtWidgets import QMainWindow, QApplication, QFileDialog
+import threading
+import time
+from PyQt5 import QtCore, QtGui, QtWidgets
+from PyQt5.QtWidgets import QMainWindow, QApplication, QMessageBox
 
 from components.side_panel import SidePanel
 from components.view_panel import ViewPanel
+from components.fetch_engine import FetchEngine
+from components.refresh_scheduler import RefreshScheduler
+from components.performance_overlay import PerformanceOverlay
 
-from view.data_visualization import *
-from view.graph import *
-from model.apirequests import*
+from view.data_visualization import DataVisualization, decode_camera_image
+from model.timeline_library import TimelineLibrary
+from instrumentation import instrumentation
+
+# matplotlib, numpy, requests and fmiopendata are imported on first use, so that the window is shown without
+# waiting for them. warm_up_imports imports them in the background after the window has been shown.
+deferred_modules = ["model.apirequests", "model.timeline_store", "model.compare", "view.graph",
+                    "view.compare_graph"]
+
+
+def warm_up_imports():
+    """
+    Imports the modules that are not needed for showing the window
+    :return: None
+    """
+
+    for module in deferred_modules:
+        __import__(module)
 
 
 class UiMainWindow(QMainWindow):
@@ -28,7 +49,38 @@ class UiMainWindow(QMainWindow):
         self.side_panel_object = None
         self.view_panel_object = None
 
+        # tab index as key and (search id, DataVisualization) of the latest search of the tab as value
+        self.tab_searches = {}
+        # views of the today and history tabs, tab index as key. They are created once and reused by every search.
+        self.tab_visualizations = {}
+        # data of every city fetched in the background, see preload_all_cities
+        self.preload_search_id = None
+        # search of the city of the preload settings, its data is kept with the preloaded data
+        self.preload_city_search_id = None
+        self.preload_search_settings = None
+        self.preloaded_settings = None
+        self.preloaded_data = {}
+        self.fetch_engine = FetchEngine()
+        self.fetch_engine.source_finished.connect(self.source_fetched, QtCore.Qt.QueuedConnection)
+        self.fetch_engine.source_failed.connect(self.source_failed, QtCore.Qt.QueuedConnection)
+        self.fetch_engine.search_finished.connect(self.search_finished, QtCore.Qt.QueuedConnection)
+        # start time of every running search from the search button, search id as key
+        self.search_start_times = {}
+
+        # The data of the today tab is refreshed in the background, see refresh_scheduler.py
+        self.today_visualization = None
+        self.refresh_scheduler = RefreshScheduler(self.fetch_engine)
+        self.refresh_scheduler.source_changed.connect(self.today_source_changed)
+
+        # timelines shown in the compare tab, side as key
+        self.compare_timelines = {}
+        # side of the compare tab where a timeline was loaded last
+        self.latest_compare_side = None
+        self.timeline_library = TimelineLibrary(self.folder / 'controller' / 'saves' / 'timelines')
+
         self.setup_ui()
+        self.timeline_library.synchronize()
+        self.filter_timelines()
 
 
     def setup_ui(self):
@@ -46,15 +98,35 @@ class UiMainWindow(QMainWindow):
         hBox.addWidget(side_panel_widget)
 
         self.side_panel_object.search_push_button.clicked.connect(self.search_with_selected_data)
+        self.side_panel_object.city_selection_combo_box.currentIndexChanged.connect(self.show_preloaded_city)
         self.side_panel_object.save_timeline_push_button.clicked.connect(self.save_timeline)
         self.side_panel_object.load_timeline_push_button_1.clicked.connect(self.display_timeline_left)
         self.side_panel_object.load_timeline_push_button_2.clicked.connect(self.display_timeline_right)
+        self.side_panel_object.timeline_city_combo_box.currentIndexChanged.connect(self.filter_timelines)
+        self.side_panel_object.timeline_dates_checkbox.stateChanged.connect(self.filter_timelines)
+        self.side_panel_object.timeline_start_date_edit.dateChanged.connect(self.filter_timelines)
+        self.side_panel_object.timeline_end_date_edit.dateChanged.connect(self.filter_timelines)
+        self.side_panel_object.timeline_list.itemDoubleClicked.connect(lambda item: self.display_timeline_next())
 
         self.view_panel_object = ViewPanel()
         self.view_panel_widget = self.view_panel_object.view_panel
         self.view_panel_widget.currentChanged.connect(self.change_tab)
         hBox.addWidget(self.view_panel_widget)
 
+        # Refreshes every source of the today tab, including the road maintenance which is not refreshed automatically
+        refresh_shortcut = QtWidgets.QShortcut(QtGui.QKeySequence(QtGui.QKeySequence.Refresh), self)
+        refresh_shortcut.activated.connect(self.refresh_scheduler.refresh_all)
+
+        # The timings of the searches are shown in the status bar, toggled with F12
+        self.performance_overlay = PerformanceOverlay()
+        self.statusBar().addWidget(self.performance_overlay, 1)
+        self.statusBar().hide()
+        self.overlay_timer = QtCore.QTimer(self)
+        self.overlay_timer.setInterval(1000)
+        self.overlay_timer.timeout.connect(self.update_performance_overlay)
+        overlay_shortcut = QtWidgets.QShortcut(QtGui.QKeySequence(QtCore.Qt.Key_F12), self)
+        overlay_shortcut.activated.connect(self.toggle_performance_overlay)
+
         frame = QtWidgets.QFrame()
         frame.setLayout(hBox)
         self.setCentralWidget(frame)
@@ -86,108 +158,453 @@ class UiMainWindow(QMainWindow):
         # VIEW JA MODEL EIVÄT SAA KOSKAAN KOMMUNIKOIDA SUORAAN KESKENÄÄN
 
 
+        start = time.perf_counter()
         settings = self.side_panel_object.get_current_settings()
-        data = {}
-
-        if settings["startDate"] != None:
-            #OBSERVED DATA
-            data['weatherData'] = weather_daily_measurements(settings["city"].upper(), datetime.strptime(settings["startDate"],'%Y-%m-%d'),
-                                                             datetime.strptime(settings["endDate"],'%Y-%m-%d'))
-            data['roadMaintenance'], data['trafficMessages'], data['roadCondition'] = road_data(
-                settings["city"].upper(), datetime.strptime(settings["startDate"], '%Y-%m-%d'), datetime.strptime(settings["endDate"], '%Y-%m-%d'))
-        else:
-            #WEATHER FORECAST
-            data['weatherData'] = weather_forecast(settings["city"].upper())
-            data['roadMaintenance'], data['trafficMessages'], data['roadCondition'] = road_data(settings["city"].upper())
+        source_requests = self.search_requests(settings)
+
+        # The view is laid out right away and filled in as each request finishes in the fetch engine
+        with instrumentation.span("layout", "search"):
+            visualization = self.show_view(settings)
+        search_id = self.fetch_engine.start_search(source_requests)
+        self.tab_searches[self.view_index(settings)] = (search_id, visualization)
+        self.search_start_times[search_id] = start
+        if settings["startDate"] is None:
+            self.refresh_scheduler.start(source_requests)
+
+        if self.side_panel_object.preload_cities_checkbox.isChecked():
+            self.preload_all_cities(settings, search_id)
+
+
+    def search_requests(self, settings):
+        """
+        Plans the requests of a search with the model
+        :param settings: dict, settings from the side panel
+        :return: dict, source name as key and a callable without arguments as value
+        """
+
+        from model.apirequests import fetch_plan
+
+        # Only the data sources selected in the side panel are requested
+        source_requests = fetch_plan(settings)
+        if "roadCamera" in source_requests:
+            # The camera image is decoded in the fetch thread as well
+            camera_request = source_requests["roadCamera"]
+            source_requests["roadCamera"] = lambda: decode_camera_image(camera_request())
+        return source_requests
+
+
+    def view_index(self, settings):
+        """
+        Tells which tab shows a search
+        :param settings: dict, settings from the side panel
+        :return: int, 0 for the today tab and 1 for the history tab
+        """
+
+        return 0 if settings["startDate"] is None else 1
+
+
+    def show_view(self, settings, data=None):
+        """
+        Shows a search in its tab. The search replaces the previous search of the same tab, and the view of the tab
+        is reused for it.
+        :param settings: dict, settings from the side panel
+        :param data: dict, data to be shown right away or None if the data is still being fetched
+        :return: DataVisualization, the view of the tab
+        """
+
+        tab_index = self.view_index(settings)
+        if tab_index in self.tab_searches:
+            self.fetch_engine.cancel_search(self.tab_searches[tab_index][0])
+            self.search_start_times.pop(self.tab_searches[tab_index][0], None)
+            del self.tab_searches[tab_index]
 
-        data['roadCamera'] = weather_cameras(settings["city"].upper())
+        visualization = self.tab_visualizations.get(tab_index)
+        if visualization is not None:
+            return visualization.get_view(settings, tab_index, data)
 
         visualization = DataVisualization()
-        tabContentWidget = visualization.get_view(settings, self.view_panel_widget.currentIndex(), data)
-        
-        if settings["startDate"] != None:
+        self.tab_visualizations[tab_index] = visualization
+        tabContentWidget = visualization.get_view(settings, tab_index, data)
+
+        if tab_index == 1:
             self.view_panel_object.set_history_tab_content(tabContentWidget)
-            
+
         else:
             self.view_panel_object.set_today_tab_content(tabContentWidget)
+            self.today_visualization = visualization
 
+        return visualization
 
 
-    def save_timeline(self):
+    def start_refresh(self, settings, data):
         """
-        Saves the timeline in json format
-        :return:
+        Starts refreshing the data of the today tab in the background
+        :param settings: dict, settings from the side panel
+        :param data: dict, data already shown in the today tab
+        :return: None
         """
 
+        self.refresh_scheduler.start(self.search_requests(settings))
+        for source, content in data.items():
+            self.refresh_scheduler.set_shown(source, content)
+
+
+    def preload_all_cities(self, settings, search_id):
+        """
+        Fetches the selected data of every city in the background, so that switching the city shows the data
+        instantly. The city of the settings is not fetched again, the data of its search is kept instead.
+        :param settings: dict, settings from the side panel
+        :param search_id: int, id of the search of the city of the settings
+        :return: None
+        """
+
+        from model.apirequests import batch_fetch_plan
+
+        batch_request = batch_fetch_plan(settings)
+
+        def request():
+            data = batch_request()
+            # The camera images are decoded in the fetch thread as well
+            for city_data in data.values():
+                if "roadCamera" in city_data:
+                    city_data["roadCamera"] = decode_camera_image(city_data["roadCamera"])
+            return data
+
+        self.fetch_engine.cancel_search(self.preload_search_id)
+        self.preloaded_settings = None
+        self.preloaded_data = {settings["city"].upper(): {}}
+        self.preload_city_search_id = search_id
+        self.preload_search_id = self.fetch_engine.start_search({"allCities": request})
+        self.preload_search_settings = settings
+
+
+    def show_preloaded_city(self):
+        """
+        Shows the preloaded data of the selected city when the city is changed
+        :return: None
+        """
+
+        if not self.side_panel_object.preload_cities_checkbox.isChecked() or self.preloaded_settings is None:
+            return
+        from model.apirequests import selected_sources
 
         settings = self.side_panel_object.get_current_settings()
-        # Save data of all the graphs and plots, messages, etc. with the settings
+        city_data = self.preloaded_data.get(settings["city"].upper(), {})
+        if not self.same_search(settings, self.preloaded_settings) or \
+                any(source not in city_data for source in selected_sources(settings)):
+            return
+
+        self.tab_searches[self.view_index(settings)] = (None, self.show_view(settings, city_data))
+        if settings["startDate"] is None:
+            self.start_refresh(settings, city_data)
+
+
+    def same_search(self, settings, other_settings):
+        """
+        Tells if two settings select the same data and time window, the city is not compared
+        :param settings: dict, settings from the side panel
+        :param other_settings: dict, settings from the side panel
+        :return: bool
+        """
+
+        keys = ["weatherInfo", "roadInfo", "startDate", "endDate"]
+        return all(settings[key] == other_settings[key] for key in keys)
+
+
+    def get_search_visualization(self, search_id):
+        """
+        Finds the view that shows the data of a search
+        :param search_id: int, id of the search
+        :return: DataVisualization or None if the search has been replaced
+        """
+
+        for tab_search_id, visualization in self.tab_searches.values():
+            if tab_search_id == search_id:
+                return visualization
+        return None
+
+
+    def source_fetched(self, search_id, source, data):
+        """
+        Passes the data of a finished request to the view of the search
+        :param search_id: int, id of the search
+        :param source: str, name of the data source
+        :param data: fetched data
+        :return: None
+        """
+
+        if search_id == self.preload_search_id:
+            self.preloaded_data.update(data)
+            self.preloaded_settings = self.preload_search_settings
+            return
+        if search_id == self.preload_city_search_id:
+            self.preloaded_data[self.preload_search_settings["city"].upper()][source] = data
+
+        visualization = self.get_search_visualization(search_id)
+        if visualization is not None:
+            with instrumentation.span("view", source):
+                visualization.set_data(source, data)
+            if visualization is self.today_visualization:
+                self.refresh_scheduler.set_shown(source, data)
+
+
+    def search_finished(self, search_id):
+        """
+        Records the time of a search from pressing the search button until every source is shown
+        :param search_id: int, id of the search
+        :return: None
+        """
+
+        start = self.search_start_times.pop(search_id, None)
+        if start is not None:
+            instrumentation.record("search", "search", (time.perf_counter() - start) * 1000, searchId=search_id)
+
+
+    def toggle_performance_overlay(self):
+        """
+        Shows or hides the performance overlay in the status bar
+        :return: None
+        """
 
-        data = {
-            "settings": settings,
-            "data": None,
-        }
+        if self.statusBar().isVisible():
+            self.overlay_timer.stop()
+            self.statusBar().hide()
+        else:
+            self.update_performance_overlay()
+            self.statusBar().show()
+            self.overlay_timer.start()
+
+
+    def update_performance_overlay(self):
+        """
+        Passes the rolling statistics of the timings to the performance overlay
+        :return: None
+        """
+
+        self.performance_overlay.set_statistics(instrumentation.statistics())
+
+
+    def today_source_changed(self, source, data):
+        """
+        Updates a section of the today tab in place when the refreshed data of the source has changed
+        :param source: str, name of the data source
+        :param data: refreshed data
+        :return: None
+        """
+
+        if self.today_visualization is not None:
+            with instrumentation.span("view", source):
+                self.today_visualization.set_data(source, data)
+
+
+    def source_failed(self, search_id, source, message):
+        """
+        Shows an error in the view of the search when a request fails
+        :param search_id: int, id of the search
+        :param source: str, name of the data source
+        :param message: str, error message
+        :return: None
+        """
+
+        visualization = self.get_search_visualization(search_id)
+        if visualization is not None:
+            visualization.set_error(source, message)
+
+
+
+    def save_timeline(self):
+        """
+        Saves the timeline shown in the history tab with its data, see timeline_store.py
+        :return: None
+        """
+
+        from model.timeline_store import timeline_suffix
+
+        # Save data of all the graphs and plots, messages, etc. with the settings of the search
+        if 1 in self.tab_searches:
+            visualization = self.tab_searches[1][1]
+            settings = visualization.settings
+            data = visualization.data
+        else:
+            settings = self.side_panel_object.get_current_settings()
+            data = {}
 
         title = settings["city"] + " " + settings["startDate"] + " - " + settings["endDate"]
-        file_name = f"{title}.json"
+        file_name = f"{title}{timeline_suffix}"
         path = self.folder / 'controller' / 'saves' / 'timelines' / file_name
-        f = open(path, "w")
-        f.write(json.dumps(data, indent=4))
-        f.close()
+
+        # A memory mapped file cannot be replaced on Windows, so a timeline open in the compare tab is copied into
+        # memory and shown again. The old views, and the pending draws of their graphs, hold on to the mapping until
+        # the control returns to the event loop, so the file is written after that.
+        reopened = False
+        for side, timeline in list(self.compare_timelines.items()):
+            if timeline.path == path:
+                timeline.close()
+                self.show_timeline(timeline, side)
+                reopened = True
+
+        if reopened:
+            QtCore.QTimer.singleShot(0, lambda: self.write_timeline_file(path, settings, data))
+        else:
+            self.write_timeline_file(path, settings, data)
+
+
+    def write_timeline_file(self, path, settings, data):
+        """
+        Writes a timeline into its file and adds it to the timeline library. Shows a message if the file can't be
+        written.
+        :param path: pathlib.Path, file of the timeline
+        :param settings: dict, settings of the search
+        :param data: dict, data of the search
+        :return: None
+        """
+
+        from model.timeline_store import write_timeline
+
+        # The slots of the old views of a reopened timeline are deleted later, and the views are in reference cycles
+        # with their graphs
+        QApplication.sendPostedEvents(None, QtCore.QEvent.DeferredDelete)
+        gc.collect()
+        try:
+            sources = write_timeline(path, settings, data)
+        except OSError as error:
+            QMessageBox.warning(self, "Save timeline", "The timeline could not be saved: " + str(error))
+            return
+        self.timeline_library.add(path, settings, sources)
+        self.filter_timelines()
+
+
+    def filter_timelines(self):
+        """
+        Searches the saved timelines from the timeline library with the filter of the side panel
+        :return: None
+        """
+
+        timeline_filter = self.side_panel_object.get_timeline_filter()
+        self.side_panel_object.set_timelines(self.timeline_library.find(
+            timeline_filter["city"], timeline_filter["startDate"], timeline_filter["endDate"]))
 
 
     def load_timeline(self):
         """
-        Loads timeline in json format
-        :return:
+        Opens the timeline selected in the saved timelines list of the side panel
+        :return: Timeline or None if no timeline is selected
         """
 
-        path = self.folder / 'controller' / 'saves' / 'timelines'
-        response = QFileDialog.getOpenFileName(
-            caption='Select saved timeline',
-            directory=str(path),
-            filter='JSON files (*.json)',
-            initialFilter='JSON files (*.json)'
-        )
-        if response and response[0] != '':
-            f = open(response[0], "r")
-            data = json.load(f)
-            f.close()
+        from model.timeline_store import read_timeline
+
+        name = self.side_panel_object.get_selected_timeline()
+        if name is None:
+            return None
+        return read_timeline(self.folder / 'controller' / 'saves' / 'timelines' / name)
+
+
+    def display_timeline(self, side):
+        """
+        Loads a timeline and requests visualization of its saved data from the view
+        :param side: str, left or right side of the compare tab
+        :return: None
+        """
+
+        try:
+            timeline = self.load_timeline()
+        except OSError:
+            # The file has been removed outside the application
+            self.timeline_library.synchronize()
+            self.filter_timelines()
+            return
+        if timeline is None:
+            return
+        self.show_timeline(timeline, side)
+        self.latest_compare_side = side
+
+
+    def show_timeline(self, timeline, side):
+        """
+        Requests visualization of the saved data of an opened timeline from the view
+        :param timeline: Timeline, see timeline_store.py
+        :param side: str, left or right side of the compare tab
+        :return: None
+        """
+
+        tabContentWidget = DataVisualization().get_view(timeline.settings, 2, timeline.data())
+        self.view_panel_object.set_compare_tab_content(tabContentWidget, side)
+        self.compare_timelines[side] = timeline
+        self.show_comparison()
+
+
+    def show_comparison(self):
+        """
+        Compares the weather data of the timelines in the compare tab when both sides have one
+        :return: None
+        """
+
+        left = self.compare_timelines.get("left")
+        right = self.compare_timelines.get("right")
+        if left is None or right is None or left.get("weatherData") is None or right.get("weatherData") is None:
+            self.view_panel_object.set_compare_diff_content(None)
+            return
+
+        from model.compare import compare_timelines
+        from view.compare_graph import CompareGraphWidget
+
+        comparisons = compare_timelines(left.get("weatherData"), right.get("weatherData"))
+        if len(comparisons["relative"].parameters) == 0:
+            # A forecast and observations have no parameters in common
+            self.view_panel_object.set_compare_diff_content(None)
+            return
+
+        titles = [timeline.settings["city"] + " " + timeline.settings["startDate"] + " - " +
+                  timeline.settings["endDate"] for timeline in [left, right]]
+        self.view_panel_object.set_compare_diff_content(CompareGraphWidget(comparisons, *titles))
+
 
     def display_timeline_left(self):
         """
-        Loads the timeline in json format and requests visualization from the view
+        Loads the timeline and requests visualization from the view
         Displays the timeline in the left compare tab
         :return: None
         """
 
-        timeline = self.load_timeline()
-        # Display data
+        self.display_timeline("left")
 
 
     def display_timeline_right(self):
         """
-        Loads the timeline in json format and requests visualization from the view
+        Loads the timeline and requests visualization from the view
         Displays the timeline in the right compare tab
         :return: None
         """
 
-        timeline = self.load_timeline()
-        # Display data
+        self.display_timeline("right")
+
+
+    def display_timeline_next(self):
+        """
+        Loads the timeline and requests visualization from the view
+        Displays the timeline on the empty side of the compare tab, or replaces the timeline that was not loaded last
+        :return: None
+        """
+
+        if "left" not in self.compare_timelines:
+            self.display_timeline("left")
+        elif "right" not in self.compare_timelines:
+            self.display_timeline("right")
+        else:
+            self.display_timeline("left" if self.latest_compare_side == "right" else "right")
 
 
 
 def main():
+    instrumentation.open_sink(pathlib.Path.cwd() / 'controller' / 'saves' / 'logs' / 'timings.jsonl')
     app = QApplication(sys.argv)
     window = UiMainWindow()
     window.show()
+    threading.Thread(target=warm_up_imports, name="warm-up", daemon=True).start()
     app.exec_()
+    window.fetch_engine.shutdown()
+    instrumentation.close_sink()
 
-    # delete road camera image
-    try:
-        os.remove(pathlib.Path.cwd() / 'controller' / 'saves' / 'images' / 'weather_cam.jpg')
-    except:
-        pass
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,207 @@
+"""
+This file implements the columnar aggregation of road condition forecasts.
+
+It is a part of the model of the application.
+
+The road conditions of all stations are first collected into NumPy columns: the station, the forecast horizon,
+the road temperature and an integer code for every categorical field. All statistics of all groups (forecast
+horizons, or stations and forecast horizons) are then computed at once with bincount based group operations
+instead of Python lists per group. Groups without any rows are reported as empty instead of failing.
+"""
+
+import numpy as np
+
+horizons = ["0h", "2h", "4h", "6h", "12h"]
+
+# Categorical fields and whether they exist in the current conditions (0h)
+categorical_fields = {"daylight": True,
+                      "overallRoadCondition": True,
+                      "precipitationCondition": False,
+                      "roadCondition": False}
+
+temperature_percentiles = [10, 50, 90]
+
+
+def road_condition_columns(condition_data):
+    """
+    Collects the road conditions of a digitraffic road condition response into columns
+    :param condition_data: dict, response of the road condition API in json format
+    :return: dict, numpy arrays "station" with the original station ids, "horizon" and "roadTemperature", an
+    integer code array for every categorical field and "categories" with the values of the codes of every
+    categorical field
+    """
+
+    horizon_codes = {name: code for code, name in enumerate(horizons)}
+    stations = []
+    horizon = []
+    temperatures = []
+    categories = {field: {} for field in categorical_fields}
+    codes = {field: [] for field in categorical_fields}
+
+    for weatherData in condition_data['weatherData']:
+        station = weatherData.get('id')
+        for roadConditions in weatherData['roadConditions']:
+            if roadConditions['forecastName'] not in horizon_codes:
+                continue
+            stations.append(station)
+            horizon.append(horizon_codes[roadConditions['forecastName']])
+            temperatures.append(float(roadConditions['roadTemperature']))
+
+            reason = roadConditions.get('forecastConditionReason') or {}
+            for field in categorical_fields:
+                value = roadConditions[field] if field in roadConditions else reason.get(field)
+                if value is None:
+                    codes[field].append(-1)
+                else:
+                    codes[field].append(categories[field].setdefault(value, len(categories[field])))
+
+    # The station ids are forecast section ids like "00004_229_00307_1_0", so they are kept as they are
+    station_column = np.empty(len(stations), dtype=object)
+    station_column[:] = stations
+    columns = {"station": station_column,
+               "horizon": np.array(horizon, dtype=np.int64),
+               "roadTemperature": np.array(temperatures, dtype=np.float64),
+               "categories": {field: list(values.keys()) for field, values in categories.items()}}
+    for field in categorical_fields:
+        columns[field] = np.array(codes[field], dtype=np.int64)
+    return columns
+
+
+def group_modes(groups, codes, group_count, category_count):
+    """
+    Most common code of every group, ties go to the category that appears first in the response
+    :param groups: numpy array, group of every row
+    :param codes: numpy array, category code of every row, -1 for missing
+    :param group_count: int, number of groups
+    :param category_count: int, number of categories
+    :return: numpy array, mode of every group or -1 if the group has no codes
+    """
+
+    if category_count == 0:
+        return np.full(group_count, -1)
+    valid = codes >= 0
+    counts = np.bincount(groups[valid] * category_count + codes[valid],
+                         minlength=group_count * category_count).reshape(group_count, category_count)
+    modes = counts.argmax(axis=1)
+    modes[counts.max(axis=1) == 0] = -1
+    return modes
+
+
+def group_percentiles(groups, values, group_count, sizes, percentiles):
+    """
+    Percentiles of every group with linear interpolation, like numpy.percentile
+    :param groups: numpy array, group of every row
+    :param values: numpy array, value of every row
+    :param group_count: int, number of groups
+    :param sizes: numpy array, number of rows in every group
+    :param percentiles: list, percentiles between 0 and 100
+    :return: numpy array of shape (groups, percentiles), NaN for empty groups
+    """
+
+    order = np.lexsort((values, groups))
+    sorted_values = values[order]
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+
+    positions = (sizes[:, None] - 1) * (np.array(percentiles, dtype=np.float64)[None, :] / 100.0)
+    positions = np.maximum(positions, 0)
+    lower = np.floor(positions).astype(np.int64)
+    upper = np.minimum(lower + 1, np.maximum(sizes[:, None] - 1, 0))
+    fraction = positions - lower
+
+    result = np.full((group_count, len(percentiles)), np.nan)
+    filled = sizes > 0
+    if filled.any():
+        low_values = sorted_values[(starts[:, None] + lower)[filled]]
+        high_values = sorted_values[(starts[:, None] + upper)[filled]]
+        result[filled] = low_values + (high_values - low_values) * fraction[filled]
+    return result
+
+
+def aggregate_groups(columns, groups, group_count):
+    """
+    Computes the statistics of every group in one pass over the columns
+    :param columns: dict, columns from road_condition_columns
+    :param groups: numpy array, group of every row
+    :param group_count: int, number of groups
+    :return: dict, name of the statistic as key and an array or list with a value for every group as value
+    """
+
+    temperatures = columns["roadTemperature"]
+    sizes = np.bincount(groups, minlength=group_count)
+    sums = np.bincount(groups, weights=temperatures, minlength=group_count)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = sums / sizes
+
+    minimums = np.full(group_count, np.inf)
+    maximums = np.full(group_count, -np.inf)
+    np.minimum.at(minimums, groups, temperatures)
+    np.maximum.at(maximums, groups, temperatures)
+
+    statistics = {"count": sizes,
+                  "roadTemperature": means,
+                  "roadTemperatureMin": minimums,
+                  "roadTemperatureMax": maximums}
+
+    percentiles = group_percentiles(groups, temperatures, group_count, sizes, temperature_percentiles)
+    for i, percentile in enumerate(temperature_percentiles):
+        statistics["roadTemperatureP" + str(percentile)] = percentiles[:, i]
+
+    for field in categorical_fields:
+        values = columns["categories"][field]
+        modes = group_modes(groups, columns[field], group_count, len(values))
+        statistics[field] = [values[mode] if mode >= 0 else None for mode in modes]
+
+    return statistics
+
+
+def horizon_summary(statistics, group, horizon):
+    """
+    Builds the summary of a single group in the format of format_road_condition. Every value is wrapped in a
+    list like before, and empty groups get empty lists.
+    :param statistics: dict, statistics from aggregate_groups
+    :param group: int, index of the group
+    :param horizon: str, name of the forecast horizon
+    :return: dict, field name as key and a list with the value as value
+    """
+
+    empty = statistics["count"][group] == 0
+    summary = {}
+    for field, values in statistics.items():
+        if field == "count":
+            continue
+        if field in categorical_fields and not categorical_fields[field] and horizon == "0h":
+            continue
+        value = values[group]
+        if isinstance(value, np.generic):
+            value = value.item()
+        summary[field] = [] if empty or value is None else [value]
+    return summary
+
+
+def aggregate_road_condition(columns):
+    """
+    Aggregates the road conditions of all stations per forecast horizon
+    :param columns: dict, columns from road_condition_columns
+    :return: dict, forecast horizon as key and the summary of the horizon as value
+    """
+
+    statistics = aggregate_groups(columns, columns["horizon"], len(horizons))
+    return {horizon: horizon_summary(statistics, i, horizon) for i, horizon in enumerate(horizons)}
+
+
+def aggregate_road_condition_by_station(columns):
+    """
+    Aggregates the road conditions per station and forecast horizon
+    :param columns: dict, columns from road_condition_columns
+    :return: dict, station id as key and a dictionary of forecast horizons and their summaries as value
+    """
+
+    # Grouped by the ids as text, so that missing or numeric ids do not break the sorting of np.unique
+    _, first_rows, station_index = np.unique(columns["station"].astype(str), return_index=True,
+                                             return_inverse=True)
+    station_index = station_index.reshape(-1)
+    groups = station_index * len(horizons) + columns["horizon"]
+    statistics = aggregate_groups(columns, groups, len(first_rows) * len(horizons))
+    return {columns["station"][row]: {horizon: horizon_summary(statistics, s * len(horizons) + h, horizon)
+                                      for h, horizon in enumerate(horizons)}
+            for s, row in enumerate(first_rows)}
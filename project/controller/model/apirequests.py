@@ -3,22 +3,33 @@ This file fetches data from digitraffic and the fmi
 
 It works as a model for the application.
 
-For data, a start and end time are required.
-
-For a forecast, the end time of the forecast is required.
+Time windows are given as TimeWindow objects, see time_window.py. Windows relative to the current time are
+computed when a request is made.
 
 Requests are parsed into python dict containers and returned.
+
+Parsed responses are cached on disk, see cache.py.
 """
 
 from datetime import datetime
 from datetime import timedelta
-import requests
-from collections import Counter
-import operator
-from fmiopendata.wfs import download_stored_query
-import json
-
-import pathlib
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from fmiopendata.multipoint import MultiPoint
+from fmiopendata.wfs import STORED_QUERY_URL
+import threading
+import time
+
+from instrumentation import span, timed
+
+from .cache import cached
+from .http_client import http_client
+from .spatial import FeatureIndex
+from .streaming import iter_features
+from .range_planner import fetch_chunks, merge_maintenance_data
+from .time_window import TimeWindow, RelativeWindow
+from .timeseries import TimeSeries
+from .aggregation import road_condition_columns, aggregate_road_condition, aggregate_road_condition_by_station
 
 fmi_queries = ["fmi::forecast::harmonie::surface::point::multipointcoverage",
                "fmi::observations::weather::multipointcoverage",
@@ -45,117 +56,394 @@ weather_camera_ids = {"TAMPERE": "C04507", "HELSINKI": "C01675",
                       "OULU": "C12503", "TURKU": "C02520",
                       "LAPPEENRANTA": "C03558"}
 
+# Longest time windows requested at once, longer windows are split by the range planner
+daily_observation_chunk_size = timedelta(days=28)
+maintenance_chunk_size = timedelta(days=1)
+
+# Windows relative to the current time are rounded to these steps, so that searches made within the same step
+# request the same window and share the cached response
+forecast_step = timedelta(hours=1)
+observation_step = timedelta(minutes=10)
+maintenance_step = timedelta(minutes=5)
+
+# Road data sources, same names as the road info selections of the side panel
+road_sources = ["roadMaintenance", "trafficMessages", "roadCondition", "roadCamera"]
+
+# Latest weather camera image of each city, city as key and a dictionary with the imageKey, the jpeg bytes and the
+# time of the last check as value
+camera_images = {}
+camera_refresh_seconds = 60
+camera_locks = {}
+camera_locks_lock = threading.Lock()
+
+
+def download_multipoint(query_id, args):
+    """
+    Downloads an fmi stored query through the shared HTTP client and parses it with fmiopendata. This is the same
+    request as fmiopendata.wfs.download_stored_query with timeseries=True, but it uses the connection pool and the
+    transport of the client, see replay.py.
+
+    :param query_id: String, id of a multipointcoverage stored query, see fmi_queries.
+    :param args: List of query arguments in format "name=value".
+    :return: fmiopendata MultiPoint object.
+    """
+    response = http_client.get(STORED_QUERY_URL + query_id + "&" + "&".join(args), conditional=False)
+    response.raise_for_status()
+    with span("parse", function="MultiPoint"):
+        return MultiPoint(response.content, query_id, timeseries=True)
+
 
-def weather_data(city, start_time=datetime.now() - timedelta(days=2), end_time=datetime.now() - timedelta(days=1),
-                 timestep="60"):
+@cached("observations", window_end="window")
+@timed("request", "weatherData")
+def weather_data(city, window=RelativeWindow(-timedelta(days=2), -timedelta(days=1), observation_step), timestep="60"):
     """
     This function calls and parses an xml-object from fmi and the corresponding data will be returned in a dictionary
     structure. Parameters apart from city have default values which will return measurements from the past day.
 
     :param city: Choose between Tampere, Helsinki, Lappeenranta, Oulu and Turku. Parameter is string format and all caps
-    :param start_time: Datetime object. Should be earlier than end_time
-    :param end_time: Datetime object. Cannot be of higher value than the current time since no measurements will exist.
+    :param window: TimeWindow or RelativeWindow object. Cannot end later than the current time since no measurements
+    will exist. Default is the day before yesterday, relative to the time of the call.
     :param timestep: Density of return values. Value means minutes in between data-points.
-    :return: Nested dictionary which contains temperatures, windspeeds and cloudiness measurements.
+    :return: TimeSeries of the first station which contains temperatures, windspeeds and cloudiness measurements.
     """
-    start = start_time.strftime("%Y-%m-%dT%H:%M:%SZ")
-    end = end_time.strftime("%Y-%m-%dT%H:%M:%SZ")
-    data = download_stored_query(fmi_queries[1],
-                                 args=["bbox=" + fmi_bbox[city], "timestep=" + timestep, "starttime=" + start,
-                                       "endtime=" + end, "parameters=t2m,ws_10min,n_man", "timeseries=True"])
-    return data.data
+    window = window.resolve()
+    start = window.start_string()
+    end = window.last(timedelta(minutes=int(timestep))).strftime("%Y-%m-%dT%H:%M:%SZ")
+    data = download_multipoint(fmi_queries[1],
+                               ["bbox=" + fmi_bbox[city], "timestep=" + timestep, "starttime=" + start,
+                                "endtime=" + end, "parameters=t2m,ws_10min,n_man"])
+    return TimeSeries.from_fmi(data.data)
 
 
-def weather_daily_measurements(city, start_time=datetime.now() - timedelta(days=14),
-                               end_time=datetime.now() - timedelta(days=1)):
+def weather_daily_measurements(city, window=RelativeWindow(-timedelta(days=14), timedelta(0), timedelta(days=1))):
     """
     Similar function to weather_data, except the timestep is a solid day and the return values signify daily averages.
 
     :param city: Choose between Tampere, Helsinki, Lappeenranta, Oulu and Turku. Parameter is string format and all caps
-    :param start_time: Datetime object. Should be earlier than end_time
-    :param end_time: Datetime object. Cannot be of higher value than the current time since no measurements will exist.
-    :return: Nested dictionary which contains temperatures, windspeeds and cloudiness measurements.
+    :param window: TimeWindow or RelativeWindow object of whole days. Cannot end later than the current time since no
+    measurements will exist. Default is the two weeks before today, relative to the time of the call.
+    :return: TimeSeries of the first station which contains daily temperatures, windspeeds and cloudiness.
     """
-    start = start_time.strftime("%Y-%m-%dT%H:%M:%SZ")
-    end = end_time.strftime("%Y-%m-%dT%H:%M:%SZ")
-    data = download_stored_query(fmi_queries[2],
-                                 args=["bbox=" + fmi_bbox[city], "timestep=1440", "starttime=" + start,
-                                       "endtime=" + end, "parameters=t2m,ws_10min,n_man", "timeseries=True"])
+    stations = weather_daily_stations(city, window)
+    return next(iter(stations.values()), TimeSeries(None, [], {}))
 
-    return data.data
+
+@cached("observations", window_end="window", settle_time=timedelta(days=1, hours=1))
+@timed("request", "weatherData")
+def weather_daily_stations(city, window=RelativeWindow(-timedelta(days=14), timedelta(0), timedelta(days=1))):
+    """
+    Daily weather measurements of every station inside the bounding box of the city, see weather_daily_measurements.
+
+    :param city: Choose between Tampere, Helsinki, Lappeenranta, Oulu and Turku. Parameter is string format and all caps
+    :param window: TimeWindow or RelativeWindow object of whole days, see weather_daily_measurements.
+    :return: Dictionary which contains the station as key and its TimeSeries as value, in the order of the response.
+    """
+    window = window.resolve()
+    start = window.start_string()
+    end = window.last(timedelta(days=1)).strftime("%Y-%m-%dT%H:%M:%SZ")
+    data = download_multipoint(fmi_queries[2],
+                               ["bbox=" + fmi_bbox[city], "timestep=1440", "starttime=" + start,
+                                "endtime=" + end, "parameters=t2m,ws_10min,n_man"])
+
+    return {station: TimeSeries.from_fmi(data.data, station) for station in data.data}
 
 
-def weather_forecast(city, start_time=datetime.now(), end_time=datetime.now() + timedelta(days=1), timestep="60"):
+@cached("forecast")
+@timed("request", "weatherData")
+def weather_forecast(city, window=RelativeWindow(timedelta(0), timedelta(days=1), forecast_step), timestep="60"):
     """
     Used for requesting weather forecasts from fmi. Values are forecasts and not measured data.
 
     :param city: Choose between Tampere, Helsinki, Lappeenranta, Oulu and Turku. Parameter is string format and all caps
-    :param start_time: Datetime object, should be current time or later and before end_time
-    :param end_time: Datetime object, should be after current time and later than start time
+    :param window: TimeWindow or RelativeWindow object, should start at the current time or later. Default is the
+    next day, relative to the time of the call.
     :param timestep: Density of return values. Value means minutes in between data-points.
-    :return: Nested dictionary which contains temperatures and windspeeds.
+    :return: TimeSeries which contains temperatures and windspeeds.
+    """
+    window = window.resolve()
+    start = window.start_string()
+    end = window.end_string()
+    data = download_multipoint(fmi_queries[0],
+                               ["latlon=" + fmi_coordinates[city], "timestep=" + timestep, "starttime=" + start,
+                                "endtime=" + end, "parameters=temperature,windspeedms"])
+    return TimeSeries.from_fmi(data.data)
+
+
+@cached("forecast")
+@timed("request", "weatherData")
+def weather_forecast_cities(cities, window, timestep="60"):
+    """
+    Requests the weather forecasts of several cities with a single multi-point query.
+
+    :param cities: List of cities in all caps.
+    :param window: TimeWindow object, should start at the current time or later.
+    :param timestep: Density of return values. Value means minutes in between data-points.
+    :return: Dictionary with the city as key and the forecast TimeSeries of the city, like weather_forecast returns,
+    as value.
+    """
+    start = window.start_string()
+    end = window.end_string()
+    data = download_multipoint(fmi_queries[0],
+                               ["latlon=" + fmi_coordinates[city] for city in cities] +
+                               ["timestep=" + timestep, "starttime=" + start, "endtime=" + end,
+                                "parameters=temperature,windspeedms"])
+
+    # The forecast points are named by fmi, so they are matched to the cities by their coordinates
+    forecasts = {}
+    for name, location in data.location_metadata.items():
+        if name not in data.data:
+            continue
+        city = min(cities, key=lambda c: coordinate_distance(fmi_coordinates[c], location))
+        forecasts[city] = TimeSeries.from_fmi(data.data, name)
+    return forecasts
+
+
+def coordinate_distance(coordinates, location):
     """
-    start = start_time.strftime("%Y-%m-%dT%H:%M:%SZ")
-    end = end_time.strftime("%Y-%m-%dT%H:%M:%SZ")
-    data = download_stored_query(fmi_queries[0],
-                                 args=["latlon=" + fmi_coordinates[city], "timestep=" + timestep, "starttime=" + start,
-                                       "endtime=" + end, "parameters=temperature,windspeedms", "timeseries=True"])
-    return data.data
+    Squared distance between fmi coordinates and a location, good enough for finding the nearest city.
+
+    :param coordinates: String "lat,lon".
+    :param location: Dictionary which contains the latitude and longitude of a location.
+    :return: Float.
+    """
+    lat, lon = [float(c) for c in coordinates.split(",")]
+    return (lat - location["latitude"]) ** 2 + (lon - location["longitude"]) ** 2
 
 
-def road_data(city, start_time=datetime.now(), end_time=datetime.now() + timedelta(days=1), task_name="",
-              situation_type=""):
+def road_data(city, window=RelativeWindow(timedelta(0), timedelta(days=1), maintenance_step), task_name="",
+              situation_type="", sources=None):
     """
     This function calls get functions for maintenance data, traffic messages
-    and road condition. Function sends a request to get weather camera image.
+    and road condition. The weather camera image is fetched separately with weather_cameras.
 
     :param city: Choose between Tampere, Helsinki, Lappeenranta, Oulu and Turku. Parameter is string format and all caps.
-    :param start_time: Datetime object, should be current time or later and before end_time.
-    :param end_time: Datetime object, should be after current time and later than start time.
+    :param window: TimeWindow or RelativeWindow object of the maintenance data. Default is the next day, relative to
+    the time of the call.
     :param task_name: String, can be used to search for a specific task from the maintenance data. Default parameter an empty string.
     :param situation_type: String, can describe which type of traffic message is searched for. Default parameter an empty string.
-    :return: Three dictionaries in which the retrieved data is formatted for use.
+    :param sources: List of data source names to fetch, see road_sources. Default None fetches all of them.
+    :return: Three dictionaries in which the retrieved data is formatted for use. Data that was not fetched is None.
     """
-    start = start_time.strftime("%Y-%m-%dT%H:%M:%SZ")
-    end = end_time.strftime("%Y-%m-%dT%H:%M:%SZ")
+    if sources is None:
+        sources = road_sources
+    window = window.resolve()
 
-    maintenance_data = get_maintenance_data(city, start, end, task_name)
-    traffic_messages = get_traffic_messages(city, situation_type)
-    road_condition = get_road_condition(city)
-    camera_success = weather_cameras(city)
+    maintenance_data = get_maintenance_data(city, window, task_name) if "roadMaintenance" in sources else None
+    traffic_messages = get_traffic_messages(city, situation_type) if "trafficMessages" in sources else None
+    road_condition = get_road_condition(city) if "roadCondition" in sources else None
     return maintenance_data, traffic_messages, road_condition
 
 
-def get_maintenance_data(city, start, end, task_name):
+def fetch_plan(settings):
+    """
+    Plans the requests of a search based on the side panel settings. Only the data sources whose output will be
+    rendered are requested.
+
+    :param settings: Dictionary of side panel settings. Contains the city, the weatherInfo flag, the roadInfo flags and
+    the startDate and endDate strings which are None for the current day.
+    :return: Dictionary which contains the selected data source names as keys and callables without arguments as values.
+    """
+    return search_requests(settings["city"].upper(), selected_window(settings), sources=selected_sources(settings))
+
+
+def selected_sources(settings):
+    """
+    Lists the data sources selected in the side panel settings.
+
+    :param settings: Dictionary of side panel settings, see fetch_plan.
+    :return: List of data source names.
+    """
+    sources = []
+    if settings["weatherInfo"]:
+        sources.append("weatherData")
+    return sources + [source for source in road_sources if settings["roadInfo"][source]]
+
+
+def selected_window(settings):
+    """
+    Parses the time window of the side panel settings.
+
+    :param settings: Dictionary of side panel settings, see fetch_plan.
+    :return: TimeWindow object of whole days, or None for the current day.
+    """
+    if settings["startDate"] is None:
+        return None
+    return TimeWindow.days(datetime.strptime(settings["startDate"], "%Y-%m-%d"),
+                           datetime.strptime(settings["endDate"], "%Y-%m-%d"))
+
+
+def search_requests(city, window=None, task_name="", situation_type="", sources=None):
+    """
+    Collects every request needed for a search without executing them, so that the caller can run them
+    concurrently or repeat them. Observed weather is requested when a time window is given, otherwise a weather
+    forecast.
+
+    :param city: Choose between Tampere, Helsinki, Lappeenranta, Oulu and Turku. Parameter is string format and all caps.
+    :param window: TimeWindow object of whole days or None. The observed time window, None for the current day.
+    :param task_name: String, can be used to search for a specific task from the maintenance data.
+    :param situation_type: String, can describe which type of traffic message is searched for.
+    :param sources: List of data source names to request. Default None requests all of them.
+    :return: Dictionary which contains the data source names as keys and callables without arguments as values.
+    """
+    if window is not None:
+        # History windows are fetched in chunks
+        weather_request = partial(weather_history, city, window)
+        maintenance_request = partial(maintenance_history, city, window, task_name)
+    else:
+        # The windows are resolved when the request is made, so that repeated requests follow the current time
+        weather_request = partial(weather_forecast, city,
+                                  RelativeWindow(timedelta(0), timedelta(days=1), forecast_step))
+        maintenance_request = partial(get_maintenance_data, city,
+                                      RelativeWindow(timedelta(0), timedelta(days=1), maintenance_step), task_name)
+
+    requests_by_source = {"weatherData": weather_request,
+                          "roadMaintenance": maintenance_request,
+                          "trafficMessages": partial(get_traffic_messages, city, situation_type),
+                          "roadCondition": partial(get_road_condition, city),
+                          "roadCamera": partial(weather_cameras, city)}
+    if sources is None:
+        return requests_by_source
+    return {source: request for source, request in requests_by_source.items() if source in sources}
+
+
+def batch_fetch_plan(settings):
+    """
+    Plans a batch search of the other cities based on the side panel settings.
+    The city of the settings is left out, since the search itself fetches it,
+    and only the selected data sources are requested.
+
+    :param settings: Dictionary of side panel settings, see fetch_plan.
+    :return: Callable without arguments which returns the data of the other cities, see all_cities_data.
+    """
+    cities = [city for city in weather_camera_ids if city != settings["city"].upper()]
+    return partial(all_cities_data, selected_window(settings), selected_sources(settings), cities)
+
+
+def all_cities_data(window=None, sources=None, cities=None):
+    """
+    Fetches the data of several cities in one pass. Payloads that are shared by
+    the cities are fetched only once: the nationwide traffic messages are
+    filtered per city and the weather forecast of all cities is requested with
+    a single multi-point query. The other requests are sent concurrently.
+
+    :param window: TimeWindow object of whole days or None. The observed time window, None for the current day.
+    :param sources: List of data source names to fetch. Default None fetches all of them.
+    :param cities: List of cities in all caps. Default None fetches all cities.
+    :return: Dictionary with the city as key and a dictionary of data source names and data as value. Sources
+    whose request failed are left out.
+    """
+    if cities is None:
+        cities = list(weather_camera_ids.keys())
+    if sources is None:
+        sources = ["weatherData"] + road_sources
+    data = {city: {} for city in cities}
+
+    forecast = window is None
+    if forecast:
+        forecast_window = TimeWindow.from_now(timedelta(0), timedelta(days=1), forecast_step)
+        maintenance_window = TimeWindow.from_now(timedelta(0), timedelta(days=1), maintenance_step)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        shared = {}
+        if "weatherData" in sources and forecast:
+            shared["weatherData"] = executor.submit(weather_forecast_cities, cities, forecast_window)
+        if "trafficMessages" in sources:
+            shared["trafficMessages"] = executor.submit(get_all_traffic_messages)
+
+        per_city = {}
+        for city in cities:
+            if "weatherData" in sources and not forecast:
+                per_city[(city, "weatherData")] = executor.submit(weather_history, city, window)
+            if "roadMaintenance" in sources:
+                if forecast:
+                    per_city[(city, "roadMaintenance")] = executor.submit(get_maintenance_data, city,
+                                                                          maintenance_window, "")
+                else:
+                    per_city[(city, "roadMaintenance")] = executor.submit(maintenance_history, city, window)
+            if "roadCondition" in sources:
+                per_city[(city, "roadCondition")] = executor.submit(get_road_condition, city)
+            if "roadCamera" in sources:
+                per_city[(city, "roadCamera")] = executor.submit(weather_cameras, city)
+
+        for (city, source), future in per_city.items():
+            if future.exception() is None:
+                data[city][source] = future.result()
+
+        if "weatherData" in shared and shared["weatherData"].exception() is None:
+            for city, city_weather in shared["weatherData"].result().items():
+                data[city]["weatherData"] = city_weather
+
+        if "trafficMessages" in shared and shared["trafficMessages"].exception() is None:
+            city_messages = format_traffic_messages_cities(cities, shared["trafficMessages"].result())
+            for city in cities:
+                data[city]["trafficMessages"] = {city: city_messages[city]}
+
+    return data
+
+
+def weather_history(city, window):
+    """
+    Daily weather measurements of an arbitrarily long range of days. The range
+    is split into chunks that are fetched concurrently with
+    weather_daily_stations and merged into one timeseries, see
+    range_planner.py. Closed chunks are reused from the response cache.
+
+    :param city: Choose between Tampere, Helsinki, Lappeenranta, Oulu and Turku. Parameter is string format and all caps
+    :param window: TimeWindow object of whole days.
+    :return: TimeSeries like weather_daily_measurements returns, of the same station in every chunk.
+    """
+    chunks = [(chunk,) for chunk in window.split(daily_observation_chunk_size)]
+    parts = fetch_chunks(partial(weather_daily_stations, city), chunks)
+    # Every chunk lists its own stations in its own order, so the station is picked from the first chunk with data
+    station = next((name for part in parts for name, series in part.items() if len(series) > 0), None)
+    return TimeSeries.concatenate([part[station] for part in parts if station in part])
+
+
+def maintenance_history(city, window, task_name=""):
     """
-    Get function for maintenance data. Saves the API data to json. Calls for
-    format_maintenance_data()-function for formatting the data.
+    Maintenance data of an arbitrarily long time window. Digitraffic accepts
+    at most a day per request, so the window is split into day chunks that are
+    fetched concurrently with get_maintenance_data and merged in time order.
 
     :param city: String all caps, region/city from which data is collected.
-    :param start: String. Should be earlier than end_time.
-    :param end: String.
+    :param window: TimeWindow object.
+    :param task_name: String, can be used to search for a specific task from the maintenance data.
+    :return: Dictionary in the same format as get_maintenance_data returns.
+    """
+    chunks = [(chunk, task_name) for chunk in window.split(maintenance_chunk_size)]
+    return merge_maintenance_data(city, fetch_chunks(partial(get_maintenance_data, city), chunks))
+
+
+@cached("maintenance", window_end="window")
+@timed("request", "roadMaintenance")
+def get_maintenance_data(city, window, task_name):
+    """
+    Get function for maintenance data. Streams the features of the API
+    response to format_maintenance_data()-function for formatting the data.
+
+    :param city: String all caps, region/city from which data is collected.
+    :param window: TimeWindow or RelativeWindow object, the tasks that end in the window are requested.
     :param task_name: String, default parameter.
     :return: Dictionary which contains formatted maintenance data.
     """
     coordinates = digitrafi_coordinates[city].split(",")
-    url = digitrafi_maintenance_base_url + start + "&endBefore=" + end \
+    url = digitrafi_maintenance_base_url + window.start_string() + "&endBefore=" + window.end_string() \
           + "&xMin=" + coordinates[0] + "&yMin=" + coordinates[1] + "&xMax=" + coordinates[2] \
           + "&yMax=" + coordinates[3] + "&taskId=" + task_name + "&domain=state-roads"
-    response = requests.get(url)
-    maintenance_data_temp = response.json()
-
-
-    maintenance_data = format_maintenance_data(city, maintenance_data_temp)
+    # The features are parsed one at a time while the response is read
+    response = http_client.get(url, conditional=False, stream=True)
+    maintenance_data = format_maintenance_data(city, {"features": iter_features(response)})
     return maintenance_data
 
 
+@timed("parse", "roadMaintenance")
 def format_maintenance_data(city, maintenance_data):
     """
     The function goes through the data retrieved from the API and formats the
     tasks and their start and end times.
 
     :param city: String all caps, region/city from which data is collected.
-    :param maintenance_data: Data retrieved from the API edited in json format.
+    :param maintenance_data: Data retrieved from the API edited in json format. The features can be any iterable.
     :return: Nested dictionary which contains the city as key and tasks, their start and end times as value.
     """
     data = {"tasks": [], "startTime": [], "endTime": []}
@@ -171,7 +459,7 @@ def format_maintenance_data(city, maintenance_data):
 
 def get_traffic_messages(city, situation_type=""):
     """
-    Get function for traffic messages. Saves the API data to json. Calls for
+    Get function for traffic messages. Calls for
     format_traffic_messages()-function for formatting the data.
 
     :param city: String all caps, region/city from which data is collected.
@@ -179,14 +467,47 @@ def get_traffic_messages(city, situation_type=""):
     is searched for. Default parameter empty string.
     :return: Dictionary which contains formatted traffic messages.
     """
+    all_traffic_messages = get_all_traffic_messages(situation_type)
+    city_messages = format_traffic_messages(city, all_traffic_messages)
+
+    return city_messages
+
+
+@cached("trafficMessages")
+@timed("request", "trafficMessages")
+def get_all_traffic_messages(situation_type=""):
+    """
+    Gets the nationwide traffic messages. The response is the same for every
+    city, so it is cached once and filtered per city afterwards.
+
+    :param situation_type: String, can describe which type of traffic message
+    is searched for. Default parameter empty string.
+    :return: Traffic messages of the whole country in json format, see slim_traffic_message.
+    """
     url = "https://tie.digitraffic.fi/api/traffic-message/v1" \
           "/messages?inactiveHours=0&includeAreaGeometry=false&situationType="\
           + situation_type
-    response = requests.get(url)
-    all_traffic_messages = response.json()
-    city_messages = format_traffic_messages(city, all_traffic_messages)
+    # The features are parsed one at a time while the response is read and
+    # only the fields used by format_traffic_messages are kept
+    response = http_client.get(url, conditional=False, stream=True)
+    return {"features": [slim_traffic_message(feature) for feature in iter_features(response)]}
 
-    return city_messages
+
+def slim_traffic_message(feature):
+    """
+    Picks the fields used by format_traffic_messages from a traffic message feature.
+
+    :param feature: Traffic message feature in json format.
+    :return: Feature in the same format containing only the geometry, the situation type and the name and comment
+    of the first announcement. The name and comment are empty if the message has no announcement or the
+    announcement has no features.
+    """
+    announcements = feature['properties'].get('announcements') or [{}]
+    announcement_features = announcements[0].get('features') or [{}]
+    return {"geometry": feature['geometry'],
+            "properties": {"situationType": feature['properties']['situationType'],
+                           "announcements": [{"features": [{"name": announcement_features[0].get('name', "")}],
+                                              "comment": announcements[0].get('comment', "")}]}}
 
 
 def format_traffic_messages(city, all_traffic_messages):
@@ -198,27 +519,39 @@ def format_traffic_messages(city, all_traffic_messages):
     :param all_traffic_messages: Data retrieved from the API edited in json format.
     :return: Nested dictionary which contains the city as key and situation type, name and comment as value.
     """
-    coordinates = digitrafi_coordinates[city].split(",")
-    coordinates = [float(c) for c in coordinates]
-    messages = {"situationType": [], "name": [], "comment": []}
-
-    for feature in all_traffic_messages['features']:
-        if feature['geometry'] != None:
-            for coords in feature['geometry']['coordinates']:
-                if type(coords) == list:
-                    for cordPair in coords:
-                        if len(cordPair) == 2:
-                            if coordinates[0] < cordPair[0] < coordinates[2] and \
-                                    cordPair[1] > coordinates[1] and cordPair[0] < coordinates[3]:
-                                messages["situationType"].append(feature['properties']['situationType'])
-                                messages["name"].append(feature['properties']['announcements'][0]['features'][0]['name'])
-                                messages["comment"].append(feature['properties']['announcements'][0]['comment'])
-                                break
-
-    traffic_msg = {city: messages}
+    return format_traffic_messages_cities([city], all_traffic_messages)
+
+
+@timed("parse", "trafficMessages")
+def format_traffic_messages_cities(cities, all_traffic_messages):
+    """
+    Formats the traffic messages of several cities at once. A message belongs
+    to a city if any point of its geometry is inside the bounding box of the
+    city. The geometries are indexed once for all cities, see spatial.py.
+
+    :param cities: List of cities in all caps.
+    :param all_traffic_messages: Data retrieved from the API edited in json format.
+    :return: Nested dictionary which contains the cities as keys and situation type, name and comment as value.
+    """
+    features = all_traffic_messages['features']
+    bboxes = {city: [float(c) for c in digitrafi_coordinates[city].split(",")] for city in cities}
+    city_features = FeatureIndex(features).features_in_bboxes(bboxes)
+
+    traffic_msg = {}
+    for city in cities:
+        messages = {"situationType": [], "name": [], "comment": []}
+        for i in city_features[city]:
+            feature = features[i]
+            messages["situationType"].append(feature['properties']['situationType'])
+            messages["name"].append(feature['properties']['announcements'][0]['features'][0]['name'])
+            messages["comment"].append(feature['properties']['announcements'][0]['comment'])
+        traffic_msg[city] = messages
+
     return traffic_msg
 
 
+@cached("roadCondition")
+@timed("request", "roadCondition")
 def get_road_condition(city):
     """
     Get function for road conditions. Saves the API data to json. Calls for
@@ -230,99 +563,77 @@ def get_road_condition(city):
     coordinates = digitrafi_coordinates[city].split(",")
     url = "https://tie.digitraffic.fi/api/v3/data/road-conditions/" \
           + coordinates[0] + "/" + coordinates[1] + "/" + coordinates[2] + "/" + coordinates[3]
-    response = requests.get(url)
-    all_condition_data = response.json()
+    response = http_client.get(url)
+    with span("decode"):
+        all_condition_data = response.json()
     condition_data = format_road_condition(city, all_condition_data)
     return condition_data
 
 
-def format_road_condition(city, condition_data):
+@timed("parse", "roadCondition")
+def format_road_condition(city, condition_data, by_station=False):
     """
     The function goes through the data retrieved from the API. Formats the road
-    conditions by time and wanted data. After collecting wanted data to
-    conditions-dictionary it is reviewed and calculate the data averages.
-    situation types and their names and comments from the wanted region/city.
+    conditions by forecast horizon and calculates the average road temperature,
+    its minimum, maximum and percentiles and the most common value of the other
+    fields. The data is aggregated in columns, see aggregation.py. Horizons
+    without any data get empty lists.
 
     :param city: String all caps, region/city from which data is collected.
     :param condition_data: Data retrieved from the API edited in json format.
+    :param by_station: Boolean, if True the conditions are aggregated per station instead of citywide.
     :return: Triple nested dictionary which contains the city, time (0h, 2h,..)
-    and wanted data about the road's condition.
-    """
-    conditions = {"0h": {"daylight": [], "roadTemperature": [],
-                         "overallRoadCondition": []},
-                  "2h": {"daylight": [], "roadTemperature": [],
-                         "overallRoadCondition": [],
-                         "precipitationCondition": [], "roadCondition": []},
-                  "4h": {"daylight": [], "roadTemperature": [],
-                         "overallRoadCondition": [],
-                         "precipitationCondition": [], "roadCondition": []},
-                  "6h": {"daylight": [], "roadTemperature": [],
-                         "overallRoadCondition": [],
-                         "precipitationCondition": [], "roadCondition": []},
-                  "12h": {"daylight": [], "roadTemperature": [],
-                          "overallRoadCondition": [],
-                          "precipitationCondition": [], "roadCondition": []}}
-
-    for weatherData in condition_data['weatherData']:
-        for roadConditions in weatherData['roadConditions']:
-            conditions[roadConditions['forecastName']]["daylight"].append(roadConditions['daylight'])
-            conditions[roadConditions['forecastName']]["roadTemperature"] += [float(roadConditions['roadTemperature'])]
-            conditions[roadConditions['forecastName']]["overallRoadCondition"].append(roadConditions['overallRoadCondition'])
-            if roadConditions['forecastName'] != "0h":
-                conditions[roadConditions['forecastName']]["precipitationCondition"].append(
-                    roadConditions['forecastConditionReason']['precipitationCondition'])
-                conditions[roadConditions['forecastName']]["roadCondition"].append(
-                    roadConditions['forecastConditionReason']['roadCondition'])
-
-    for data in conditions.values():
-        temp_daylight = Counter(data["daylight"])
-        avg_daylight = max(temp_daylight.items(), key=operator.itemgetter(1))[0]
-        data["daylight"] = [avg_daylight]
-
-        avg_road_temp = sum(data["roadTemperature"]) / len(data["roadTemperature"])
-        data["roadTemperature"] = [avg_road_temp]
-
-        temp_ovcond = Counter(data["overallRoadCondition"])
-        avg_ovcond = max(temp_ovcond.items(), key=operator.itemgetter(1))[0]
-        data["overallRoadCondition"] = [avg_ovcond]
-
-        if "precipitationCondition" in data:
-            temp_precip = Counter(data["precipitationCondition"])
-            avg_precip = max(temp_precip.items(), key=operator.itemgetter(1))[0]
-            data["precipitationCondition"] = [avg_precip]
-
-        if "roadCondition" in data:
-            temp_rd = Counter(data["roadCondition"])
-            avg_rd = max(temp_rd.items(), key=operator.itemgetter(1))[0]
-            data["roadCondition"] = [avg_rd]
-
-    current_cond = {city: conditions}
-    return current_cond
+    and wanted data about the road's condition. With by_station the station id
+    is between the city and the time.
+    """
+    columns = road_condition_columns(condition_data)
+    if by_station:
+        return {city: aggregate_road_condition_by_station(columns)}
+    return {city: aggregate_road_condition(columns)}
 
 
+@timed("request", "roadCamera")
 def weather_cameras(city):
     """
     Gets a weather camera image of the wanted city from a specific weather
-    camera. And saves the camera image to the project path.
+    camera. The image is returned as bytes and never written to disk.
+
+    The latest image of each city is kept in memory. It is returned without
+    any request if it was checked less than camera_refresh_seconds ago.
+    Otherwise the station history is checked and the image is downloaded
+    only if the history entry has changed. Concurrent calls for the same
+    camera wait for each other instead of downloading the same image in
+    parallel.
 
     :param city: String all caps, region/city from which data is collected.
-    :return: Boolean value based on the success of image request.
+    :return: Dictionary with the imageKey tuple (station id, preset id, timestamp) identifying the image and the
+    image as jpeg bytes, or None if the image request failed.
     """
     camera_id = weather_camera_ids[city]
-    url = "https://tie.digitraffic.fi/api/weathercam/v1/stations/"+camera_id+"/history"
-    response = requests.get(url)
-    camera_data = response.json()
+    with camera_locks_lock:
+        camera_lock = camera_locks.setdefault(camera_id, threading.Lock())
 
-    image_url = camera_data['presets'][0]['history'][0]['imageUrl']
-    image_response = requests.get(image_url)
+    with camera_lock:
+        cached_camera = camera_images.get(city)
+        if cached_camera is not None and time.monotonic() - cached_camera["checked"] < camera_refresh_seconds:
+            return {"imageKey": cached_camera["imageKey"], "image": cached_camera["image"]}
 
+        url = "https://tie.digitraffic.fi/api/weathercam/v1/stations/"+camera_id+"/history"
+        response = http_client.get(url)
+        camera_data = response.json()
 
-    path = pathlib.Path.cwd() / 'controller' / 'saves' / 'images' / 'weather_cam.jpg'
+        preset = camera_data['presets'][0]
+        latest = preset['history'][0]
+        image_key = (camera_id, preset['id'], latest['lastModified'])
 
+        if cached_camera is not None and cached_camera["imageKey"] == image_key:
+            image = cached_camera["image"]
+        else:
+            image_response = http_client.get(latest['imageUrl'], conditional=False)
+            if image_response.status_code != 200:  # 200 means response OK
+                return None
+            image = image_response.content
 
-    if image_response.status_code == 200:  # 200 means response OK
-        with path.open('wb') as f:
-            f.write(image_response.content)
-            return True
+        camera_images[city] = {"imageKey": image_key, "image": image, "checked": time.monotonic()}
 
-    return False
+    return {"imageKey": image_key, "image": image}
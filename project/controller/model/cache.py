@@ -0,0 +1,237 @@
+"""
+This file implements a persistent on-disk cache for the responses of fmi and digitraffic.
+
+It is a part of the model of the application.
+
+Responses are stored in a SQLite database in the saves folder, so they survive restarts.
+Entries are keyed on the data source, the request function and its arguments (city, time window and parameters).
+
+Every data source has its own time to live. Responses for a time window that has already closed can never
+change, so they are stored without an expiry time. The total size of the cache is bounded and the least recently
+used entries are evicted first. Hits and misses are counted for each source.
+"""
+
+from datetime import datetime
+from datetime import timedelta
+import functools
+import hashlib
+import inspect
+import json
+import pathlib
+import pickle
+import sqlite3
+import threading
+import time
+
+from .time_window import TimeWindow, RelativeWindow, now
+
+# Time to live of cached responses in seconds for each data source
+source_ttls = {"forecast": 15 * 60,
+               "observations": 10 * 60,
+               "maintenance": 5 * 60,
+               "trafficMessages": 2 * 60,
+               "roadCondition": 5 * 60}
+
+default_cache_path = pathlib.Path.cwd() / 'controller' / 'saves' / 'cache' / 'responses.sqlite'
+default_max_bytes = 64 * 1024 * 1024
+
+# Part of every cache key, increase when the format of the cached values changes so that old entries are not used
+cache_format_version = 2
+
+
+class ResponseCache:
+
+    def __init__(self, path=default_cache_path, max_bytes=default_max_bytes):
+        self.path = pathlib.Path(path)
+        self.max_bytes = max_bytes
+        self.connection = None
+        self.lock = threading.Lock()
+        self.hits = {}
+        self.misses = {}
+
+
+    def connect(self):
+        """
+        Opens the database on first use and creates the table if needed
+        :return: sqlite3.Connection
+        """
+
+        if self.connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.connection = sqlite3.connect(str(self.path), check_same_thread=False)
+            self.connection.execute("CREATE TABLE IF NOT EXISTS responses ("
+                                    "key TEXT PRIMARY KEY, source TEXT, value BLOB, size INTEGER, "
+                                    "expires REAL, last_access REAL)")
+            self.connection.commit()
+        return self.connection
+
+
+    def get(self, source, key):
+        """
+        Looks up a cached response
+        :param source: str, name of the data source
+        :param key: str, cache key of the request
+        :return: (bool, object), tells if the response was found and the response itself
+        """
+
+        now = time.time()
+        with self.lock:
+            try:
+                connection = self.connect()
+                row = connection.execute("SELECT value, expires FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is not None and (row[1] is None or row[1] > now):
+                    connection.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+                    connection.commit()
+                    self.hits[source] = self.hits.get(source, 0) + 1
+                    return True, pickle.loads(row[0])
+            except (sqlite3.Error, pickle.UnpicklingError):
+                pass
+
+            self.misses[source] = self.misses.get(source, 0) + 1
+            return False, None
+
+
+    def put(self, source, key, value, ttl):
+        """
+        Stores a response and evicts the least recently used entries if the cache grows too large
+        :param source: str, name of the data source
+        :param key: str, cache key of the request
+        :param value: response to be stored, must be picklable
+        :param ttl: float or None, time to live in seconds. None means the response never expires.
+        :return: None
+        """
+
+        now = time.time()
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        expires = None if ttl is None else now + ttl
+        with self.lock:
+            try:
+                connection = self.connect()
+                connection.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                                   (key, source, blob, len(blob), expires, now))
+                self.evict(now)
+                connection.commit()
+            except sqlite3.Error:
+                pass
+
+
+    def evict(self, now):
+        """
+        Removes expired entries and then the least recently used entries until the cache fits in max_bytes
+        :param now: float, current time as a timestamp
+        :return: None
+        """
+
+        self.connection.execute("DELETE FROM responses WHERE expires IS NOT NULL AND expires <= ?", (now,))
+        total = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        evicted = []
+        for key, size in self.connection.execute("SELECT key, size FROM responses ORDER BY last_access"):
+            if total <= self.max_bytes:
+                break
+            evicted.append((key,))
+            total -= size
+        self.connection.executemany("DELETE FROM responses WHERE key = ?", evicted)
+
+
+    def stats(self):
+        """
+        Collects the hit and miss counters and the size of the cache
+        :return: dict, hits and misses per source, number of entries and total size in bytes
+        """
+
+        with self.lock:
+            try:
+                entries, size = self.connect().execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+            except sqlite3.Error:
+                entries, size = 0, 0
+            return {"hits": dict(self.hits), "misses": dict(self.misses), "entries": entries, "bytes": size}
+
+
+    def clear(self):
+        """
+        Removes all cached responses and resets the counters
+        :return: None
+        """
+
+        with self.lock:
+            self.connect().execute("DELETE FROM responses")
+            self.connection.commit()
+            self.hits.clear()
+            self.misses.clear()
+
+
+response_cache = ResponseCache()
+
+
+def make_key(source, function_name, arguments):
+    """
+    Builds a cache key from the request function and its arguments
+    :param source: str, name of the data source
+    :param function_name: str, name of the request function
+    :param arguments: dict, argument names and values of the request
+    :return: str, cache key
+    """
+
+    text = json.dumps([cache_format_version, source, function_name, arguments], sort_keys=True, default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def window_closed(end, settle_time):
+    """
+    Tells if the time window of a request has closed, in which case its response can no longer change
+    :param end: TimeWindow, datetime or str in format %Y-%m-%dT%H:%M:%SZ, end of the time window
+    :param settle_time: timedelta, time after the end of the window until the data is final
+    :return: bool
+    """
+
+    if isinstance(end, TimeWindow):
+        end = end.end
+    elif isinstance(end, str):
+        end = datetime.strptime(end, "%Y-%m-%dT%H:%M:%SZ")
+    return end + settle_time < now()
+
+
+def cached(source, window_end=None, settle_time=timedelta(hours=1), cache=None):
+    """
+    Decorator that caches the return value of a request function in the response cache.
+
+    :param source: str, name of the data source, see source_ttls
+    :param window_end: str or None, name of the argument that holds the time window or its end of the request.
+    Responses for a closed window never expire.
+    :param settle_time: timedelta, time after the end of the window until the data is final
+    :param cache: ResponseCache or None, cache to be used. Default None uses the shared response cache.
+    :return: decorated function
+    """
+
+    def decorator(function):
+        signature = inspect.signature(function)
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            used_cache = cache or response_cache
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            # Windows relative to the current time are resolved first, so that the key has the actual window
+            for name, argument in bound.arguments.items():
+                if isinstance(argument, RelativeWindow):
+                    bound.arguments[name] = argument.resolve()
+            key = make_key(source, function.__name__, bound.arguments)
+
+            found, value = used_cache.get(source, key)
+            if found:
+                return value
+
+            value = function(*bound.args, **bound.kwargs)
+            ttl = source_ttls[source]
+            if window_end is not None and window_closed(bound.arguments[window_end], settle_time):
+                ttl = None
+            used_cache.put(source, key, value, ttl)
+            return value
+
+        return wrapper
+
+    return decorator
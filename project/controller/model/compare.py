@@ -0,0 +1,116 @@
+"""
+This file implements the comparison of two saved timelines.
+
+It is a part of the model of the application.
+
+The weather data of the two timelines are aligned onto a common time grid and the difference of every parameter
+is computed at once over the whole grid. The timelines can be aligned by the time since the start of each
+timeline ("relative", day 1 against day 1) or by the absolute time ("absolute"). The step of the grid is the
+shorter of the measurement intervals of the timelines, and the values are linearly interpolated onto the grid.
+Grid points outside a timeline are NaN.
+"""
+
+import numpy as np
+
+alignment_modes = ["relative", "absolute"]
+
+# Longest grid computed, longer grids use a longer step
+max_grid_points = 100000
+default_step_seconds = 3600
+
+
+class Comparison:
+
+    __slots__ = ("mode", "grid", "parameters", "left", "right", "delta")
+
+    def __init__(self, mode, grid, parameters, left, right, delta):
+        """
+        :param mode: str, "relative" or "absolute"
+        :param grid: numpy array, seconds since the start of the timelines in relative mode, datetime64 in
+        absolute mode
+        :param parameters: list, names of the compared parameters
+        :param left: dict, parameter name as key and the values of the left timeline on the grid as value
+        :param right: dict, parameter name as key and the values of the right timeline on the grid as value
+        :param delta: dict, parameter name as key and right minus left on the grid as value
+        """
+
+        self.mode = mode
+        self.grid = grid
+        self.parameters = parameters
+        self.left = left
+        self.right = right
+        self.delta = delta
+
+
+def time_axis_seconds(series, mode):
+    """
+    :param series: TimeSeries
+    :param mode: str, "relative" or "absolute"
+    :return: numpy float64 array, times of the series in seconds since its start or since the epoch
+    """
+
+    seconds = series.times.astype(np.int64).astype(np.float64)
+    if mode == "relative" and len(seconds) > 0:
+        seconds -= seconds[0]
+    return seconds
+
+
+def grid_step(*axes):
+    """
+    :param axes: numpy arrays of times in seconds
+    :return: float, the shortest median interval of the axes in seconds
+    """
+
+    steps = [np.median(np.diff(axis)) for axis in axes if len(axis) > 1]
+    steps = [step for step in steps if step > 0]
+    return min(steps) if steps else default_step_seconds
+
+
+def compare_timeseries(left, right, mode="relative"):
+    """
+    Aligns two timeseries onto a common grid and computes the differences of their common parameters
+    :param left: TimeSeries
+    :param right: TimeSeries
+    :param mode: str, "relative" or "absolute", see alignment_modes
+    :return: Comparison
+    """
+
+    if mode not in alignment_modes:
+        raise ValueError("Unknown alignment mode %s" % mode)
+
+    parameters = [name for name in left.parameters if name in right.columns]
+    left_axis = time_axis_seconds(left, mode)
+    right_axis = time_axis_seconds(right, mode)
+    axes = [axis for axis in (left_axis, right_axis) if len(axis) > 0]
+    if not axes:
+        grid = np.empty(0)
+    else:
+        start = min(axis[0] for axis in axes)
+        end = max(axis[-1] for axis in axes)
+        step = max(grid_step(*axes), (end - start) / max_grid_points)
+        grid = start + np.arange(int(np.floor((end - start) / step)) + 1) * step
+
+    def on_grid(axis, values):
+        if len(axis) == 0:
+            return np.full(len(grid), np.nan, dtype=np.float32)
+        return np.interp(grid, axis, values, left=np.nan, right=np.nan).astype(np.float32)
+
+    left_values = {name: on_grid(left_axis, left[name]) for name in parameters}
+    right_values = {name: on_grid(right_axis, right[name]) for name in parameters}
+    delta = {name: right_values[name] - left_values[name] for name in parameters}
+
+    if mode == "absolute":
+        grid = grid.astype(np.int64).astype("datetime64[s]")
+    return Comparison(mode, grid, parameters, left_values, right_values, delta)
+
+
+def compare_timelines(left, right):
+    """
+    Compares two timeseries with every alignment mode, so that the view can switch between them without
+    recomputation
+    :param left: TimeSeries
+    :param right: TimeSeries
+    :return: dict, alignment mode as key and Comparison as value
+    """
+
+    return {mode: compare_timeseries(left, right, mode) for mode in alignment_modes}
@@ -0,0 +1,97 @@
+"""
+This file implements the shared HTTP client of the model.
+
+All digitraffic and weather camera requests go through the same client, which
+- keeps connections to the same host alive in a connection pool instead of opening a new TCP and TLS connection
+  for every request
+- asks for gzip compressed responses
+- retries failed requests a bounded number of times with an exponential backoff
+- uses a timeout for every request
+- makes conditional requests with ETag and If-Modified-Since, so that unchanged responses are not downloaded again
+- records the network wait and the received bytes of every request, see instrumentation.py
+"""
+
+from collections import OrderedDict
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from instrumentation import span
+
+default_headers = {"Accept-Encoding": "gzip",
+                   "Digitraffic-User": "RoadWatch"}
+
+# Connect and read timeouts in seconds
+default_timeout = (5, 30)
+
+
+class HttpClient:
+
+    def __init__(self, retries=3, backoff_factor=0.5, pool_size=10, timeout=default_timeout,
+                 max_conditional_entries=32):
+        self.timeout = timeout
+        self.max_conditional_entries = max_conditional_entries
+
+        retry = Retry(total=retries, backoff_factor=backoff_factor, status_forcelist=[429, 500, 502, 503, 504],
+                      allowed_methods=["GET"], raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+        self.session = requests.Session()
+        self.session.headers.update(default_headers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        # url as key and the latest response with an ETag or Last-Modified header as value
+        self.conditional_responses = OrderedDict()
+        self.lock = threading.Lock()
+
+
+    def get(self, url, conditional=True, **kwargs):
+        """
+        Sends a GET request through the shared session
+        :param url: str, url of the request
+        :param conditional: bool, if True the request is made conditional on the previous response to the same url
+        and the previous response is returned if the server answers 304 Not Modified
+        :param kwargs: other arguments for requests.Session.get
+        :return: requests.Response
+        """
+
+        kwargs.setdefault("timeout", self.timeout)
+        headers = dict(kwargs.pop("headers", None) or {})
+
+        previous = None
+        if conditional:
+            with self.lock:
+                previous = self.conditional_responses.get(url)
+            if previous is not None:
+                if "ETag" in previous.headers:
+                    headers["If-None-Match"] = previous.headers["ETag"]
+                if "Last-Modified" in previous.headers:
+                    headers["If-Modified-Since"] = previous.headers["Last-Modified"]
+
+        # A streamed body is read later by the caller, then the span covers the wait for the headers only and the
+        # bytes are counted as the body is read, see streaming.py. Content-Length is the compressed size, so the
+        # received bytes are the length of the decompressed body.
+        with span("network", url=url.split("?")[0]) as fields:
+            response = self.session.get(url, headers=headers, **kwargs)
+            fields["status"] = response.status_code
+            if not kwargs.get("stream"):
+                fields["bytes"] = len(response.content)
+
+        if response.status_code == 304 and previous is not None:
+            return previous
+
+        if conditional and response.status_code == 200 and \
+                ("ETag" in response.headers or "Last-Modified" in response.headers):
+            with self.lock:
+                self.conditional_responses[url] = response
+                self.conditional_responses.move_to_end(url)
+                while len(self.conditional_responses) > self.max_conditional_entries:
+                    self.conditional_responses.popitem(last=False)
+
+        return response
+
+
+http_client = HttpClient()
@@ -0,0 +1,69 @@
+"""
+This file implements the range planner for long history requests.
+
+It is a part of the model of the application.
+
+Long time windows are split into chunks that the APIs accept (digitraffic maintenance accepts at most a day per
+request and fmi limits the length of observation queries). The chunk boundaries are aligned to whole multiples
+of the chunk size, so overlapping windows produce identical chunks and the chunks are reused from the response
+cache. The chunks are fetched concurrently and merged back into one ordered result.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+# Chunk boundaries are aligned to multiples of the chunk size counted from this day
+alignment_origin = datetime(2000, 1, 1)
+
+max_chunk_workers = 6
+
+
+def split_window(start_time, end_time, chunk_size):
+    """
+    Splits a half-open time window [start_time, end_time) into aligned chunks
+    :param start_time: datetime, start of the window
+    :param end_time: datetime, end of the window
+    :param chunk_size: timedelta, maximum length of a chunk
+    :return: list of (start, end) datetime tuples in time order
+    """
+
+    chunks = []
+    chunk_start = start_time
+    while chunk_start < end_time:
+        chunks_since_origin = (chunk_start - alignment_origin) // chunk_size
+        chunk_end = min(alignment_origin + (chunks_since_origin + 1) * chunk_size, end_time)
+        chunks.append((chunk_start, chunk_end))
+        chunk_start = chunk_end
+    return chunks
+
+
+def fetch_chunks(request, chunks, max_workers=max_chunk_workers):
+    """
+    Fetches the chunks concurrently
+    :param request: callable taking the arguments of a chunk, the TimeWindow of the chunk first
+    :param chunks: list of argument tuples, like (TimeWindow,) or (TimeWindow, task name), see TimeWindow.split
+    :param max_workers: int, maximum number of concurrent requests
+    :return: list of the results of request in the order of the chunks
+    """
+
+    if not chunks:
+        return []
+    if len(chunks) == 1:
+        return [request(*chunks[0])]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as executor:
+        return list(executor.map(lambda chunk: request(*chunk), chunks))
+
+
+def merge_maintenance_data(city, parts):
+    """
+    Merges the maintenance data of consecutive chunks in time order
+    :param city: str, city in all caps
+    :param parts: list of dictionaries from format_maintenance_data
+    :return: dictionary in the same format
+    """
+
+    data = {"tasks": [], "startTime": [], "endTime": []}
+    for part in parts:
+        for key in data:
+            data[key] += part[city][key]
+    return {city: data}
@@ -0,0 +1,305 @@
+"""
+This file implements the recording and replay transport of the model.
+
+It is a part of the model of the application.
+
+Every request of the model goes through the session of the shared HTTP client, see http_client.py. A recording
+transport sends the requests to the real APIs and saves every response in a fixture store. A replay transport
+answers the same requests from the fixture store without any network, optionally with an added latency and with the
+json payloads scaled up, so the throughput and latency of the whole search path can be measured reproducibly on an
+isolated machine.
+
+The urls of the model contain the time window of the request, so the time of the recording is saved in the fixture
+store and the clock of time_window.py is set to it while replaying.
+"""
+
+from datetime import datetime
+import hashlib
+import io
+import json
+import pathlib
+import threading
+import time
+
+from requests import Response
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.exceptions import ConnectionError
+from requests.structures import CaseInsensitiveDict
+
+from . import time_window
+from .http_client import http_client
+
+store_file_name = "store.json"
+# Headers that describe the transfer of the original response, not its content
+transfer_headers = ["Content-Encoding", "Content-Length", "Transfer-Encoding", "Connection", "Keep-Alive"]
+
+# Adapters of the session and the fmiopendata url reader replaced by install, restored by uninstall
+installed = {}
+
+
+def request_key(method, url):
+    """
+    :param method: str, http method
+    :param url: str, url of the request
+    :return: str, file name of the response in the fixture store
+    """
+
+    return hashlib.sha256((method + " " + url).encode("utf-8")).hexdigest()
+
+
+def scale_payload(body, scale):
+    """
+    Makes a json payload larger by repeating the items of its top level lists, like the features of a
+    FeatureCollection. Other payloads are returned as they are.
+    :param body: bytes, response body
+    :param scale: int, how many times the items are repeated
+    :return: bytes, scaled response body
+    """
+
+    if scale == 1:
+        return body
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        return body
+    if not isinstance(payload, dict):
+        return body
+    for key, value in payload.items():
+        if isinstance(value, list):
+            payload[key] = value * scale
+    return json.dumps(payload).encode("utf-8")
+
+
+class FixtureStore:
+
+    def __init__(self, folder):
+        """
+        :param folder: pathlib.Path, folder of the recorded responses
+        """
+
+        self.folder = pathlib.Path(folder)
+        self.lock = threading.Lock()
+
+
+    def recorded_at(self):
+        """
+        :return: datetime or None, the time when the fixtures were recorded
+        """
+
+        path = self.folder / store_file_name
+        if not path.exists():
+            return None
+        return datetime.fromisoformat(json.loads(path.read_text())["recordedAt"])
+
+
+    def start_recording(self, recorded_at):
+        """
+        Saves the time of the recording
+        :param recorded_at: datetime, current time of the model during the recording
+        :return: None
+        """
+
+        self.folder.mkdir(parents=True, exist_ok=True)
+        (self.folder / store_file_name).write_text(json.dumps({"recordedAt": recorded_at.isoformat()}))
+
+
+    def put(self, method, url, status, headers, body):
+        """
+        Saves a response. The meta data is saved in a json file and the body next to it as it is.
+        :param method: str, http method
+        :param url: str, url of the request
+        :param status: int, status code of the response
+        :param headers: dict, headers of the response
+        :param body: bytes, decoded body of the response
+        :return: None
+        """
+
+        key = request_key(method, url)
+        headers = {name: value for name, value in headers.items() if name not in transfer_headers}
+        meta = {"method": method, "url": url, "status": status, "headers": headers}
+        with self.lock:
+            self.folder.mkdir(parents=True, exist_ok=True)
+            (self.folder / (key + ".body")).write_bytes(body)
+            (self.folder / (key + ".json")).write_text(json.dumps(meta, indent=1))
+
+
+    def get(self, method, url):
+        """
+        :param method: str, http method
+        :param url: str, url of the request
+        :return: tuple of status, headers and body, or None if the request has not been recorded
+        """
+
+        key = request_key(method, url)
+        meta_path = self.folder / (key + ".json")
+        if not meta_path.exists():
+            return None
+        meta = json.loads(meta_path.read_text())
+        return meta["status"], meta["headers"], (self.folder / (key + ".body")).read_bytes()
+
+
+class RecordingAdapter(HTTPAdapter):
+
+    def __init__(self, store, **kwargs):
+        """
+        :param store: FixtureStore, store of the recorded responses
+        :param kwargs: arguments of requests.adapters.HTTPAdapter
+        """
+
+        super(RecordingAdapter, self).__init__(**kwargs)
+        self.store = store
+
+
+    def send(self, request, **kwargs):
+        """
+        Sends the request to the real API and saves the response. Not modified responses are not saved, since they
+        have no body.
+        """
+
+        response = super(RecordingAdapter, self).send(request, **kwargs)
+        if response.status_code != 304:
+            # Reading the content here keeps it available for streaming reads of the caller as well
+            self.store.put(request.method, request.url, response.status_code, dict(response.headers),
+                           response.content)
+        return response
+
+
+class ReplayAdapter(BaseAdapter):
+
+    def __init__(self, store, latency=0.0, scale=1):
+        """
+        :param store: FixtureStore, store of the recorded responses
+        :param latency: float, seconds added to every request
+        :param scale: int, how many times the items of json payloads are repeated, see scale_payload
+        """
+
+        super(ReplayAdapter, self).__init__()
+        self.store = store
+        self.latency = latency
+        self.scale = scale
+        # Requests are sent from several fetch threads at once
+        self.request_count = 0
+        self.lock = threading.Lock()
+
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        """
+        Answers a request from the fixture store. A request conditional on the recorded ETag is answered 304 Not
+        Modified. Requests that have not been recorded fail like an unreachable server.
+        """
+
+        if self.latency:
+            time.sleep(self.latency)
+        with self.lock:
+            self.request_count += 1
+
+        recorded = self.store.get(request.method, request.url)
+        if recorded is None:
+            raise ConnectionError("No recorded response for " + request.url, request=request)
+        status, headers, body = recorded
+
+        etag = headers.get("ETag")
+        if etag is not None and request.headers.get("If-None-Match") == etag:
+            status = 304
+            body = b""
+        else:
+            body = scale_payload(body, self.scale)
+
+        response = Response()
+        response.status_code = status
+        response.reason = "Not Modified" if status == 304 else "Replayed"
+        response.headers = CaseInsensitiveDict(headers)
+        response.headers["Content-Length"] = str(len(body))
+        response.raw = io.BytesIO(body)
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        return response
+
+
+    def close(self):
+        pass
+
+
+def read_url(url):
+    """
+    Replaces fmiopendata.multipoint.read_url while a transport is installed, so that the parameter descriptions
+    fmiopendata reads during parsing go through the transport as well
+    :param url: str
+    :return: bytes, body of the response
+    """
+
+    return http_client.get(url, conditional=False).content
+
+
+def install(adapter):
+    """
+    Routes every request of the model through an adapter
+    :param adapter: RecordingAdapter or ReplayAdapter
+    :return: None
+    """
+
+    from fmiopendata import multipoint
+
+    uninstall()
+    installed["adapters"] = {prefix: http_client.session.adapters[prefix] for prefix in ["https://", "http://"]}
+    installed["read_url"] = multipoint.read_url
+    installed["clock"] = time_window.clock
+    for prefix in installed["adapters"]:
+        http_client.session.mount(prefix, adapter)
+    multipoint.read_url = read_url
+    # Responses of the previous transport must not answer the conditional requests of this one
+    http_client.conditional_responses.clear()
+
+
+def uninstall():
+    """
+    Restores the real transport
+    :return: None
+    """
+
+    from fmiopendata import multipoint
+
+    if not installed:
+        return
+    for prefix, adapter in installed["adapters"].items():
+        http_client.session.mount(prefix, adapter)
+    multipoint.read_url = installed["read_url"]
+    time_window.set_clock(installed["clock"])
+    http_client.conditional_responses.clear()
+    installed.clear()
+
+
+def record(folder):
+    """
+    Records the responses of the real APIs into a fixture store until uninstall is called
+    :param folder: pathlib.Path, folder of the fixture store
+    :return: FixtureStore
+    """
+
+    store = FixtureStore(folder)
+    install(RecordingAdapter(store, max_retries=http_client.session.adapters["https://"].max_retries))
+    # The clock is frozen, so that every request of the recording uses the same time windows as the replay
+    recorded_at = time_window.now()
+    store.start_recording(recorded_at)
+    time_window.set_clock(lambda: recorded_at)
+    return store
+
+
+def replay(folder, latency=0.0, scale=1):
+    """
+    Answers the requests of the model from a fixture store until uninstall is called
+    :param folder: pathlib.Path, folder of the fixture store
+    :param latency: float, seconds added to every request
+    :param scale: int, how many times the items of json payloads are repeated
+    :return: ReplayAdapter
+    """
+
+    store = FixtureStore(folder)
+    recorded_at = store.recorded_at()
+    if recorded_at is None:
+        raise FileNotFoundError("No recording in " + str(folder))
+    adapter = ReplayAdapter(store, latency, scale)
+    install(adapter)
+    time_window.set_clock(lambda: recorded_at)
+    return adapter
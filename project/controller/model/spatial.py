@@ -0,0 +1,107 @@
+"""
+This file implements a spatial index for filtering traffic messages by city.
+
+It is a part of the model of the application.
+
+The geometries of all traffic message features are flattened once into NumPy coordinate arrays and a bounding
+box is precomputed for every feature. Cities are then matched against all features at once: only the points of
+features whose bounding box overlaps a city bounding box are tested, and the test is vectorized over the points
+and the cities.
+
+Bounding boxes are given as [min longitude, min latitude, max longitude, max latitude] like in digitraffic.
+"""
+
+from itertools import chain
+
+import numpy as np
+
+
+class FeatureIndex:
+
+    def __init__(self, features):
+        """
+        Builds the index
+        :param features: list, GeoJSON features. Features without geometry are never matched.
+        """
+
+        points = []
+        counts = np.zeros(len(features), dtype=np.int64)
+        for i, feature in enumerate(features):
+            geometry = feature.get('geometry')
+            if geometry is None:
+                continue
+            count = len(points)
+            flatten_coordinates(geometry['coordinates'], points)
+            counts[i] = len(points) - count
+
+        self.feature_count = len(features)
+        # fromiter over the flattened floats is much faster than converting a list of pairs with np.array
+        self.points = np.fromiter(chain.from_iterable(points), dtype=np.float64,
+                                  count=2 * len(points)).reshape(-1, 2)
+        self.owners = np.repeat(np.arange(self.feature_count), counts)
+
+        # Bounding box of every feature, features without points get an empty box that never overlaps anything
+        self.feature_bboxes = np.empty((self.feature_count, 4))
+        self.feature_bboxes[:, :2] = np.inf
+        self.feature_bboxes[:, 2:] = -np.inf
+        if len(self.owners) > 0:
+            np.minimum.at(self.feature_bboxes[:, 0], self.owners, self.points[:, 0])
+            np.minimum.at(self.feature_bboxes[:, 1], self.owners, self.points[:, 1])
+            np.maximum.at(self.feature_bboxes[:, 2], self.owners, self.points[:, 0])
+            np.maximum.at(self.feature_bboxes[:, 3], self.owners, self.points[:, 1])
+
+
+    def features_in_bboxes(self, bboxes):
+        """
+        Finds the features that have at least one point strictly inside each bounding box
+        :param bboxes: dict, name as key and bounding box [min lon, min lat, max lon, max lat] as value
+        :return: dict, name as key and an ascending array of feature indices as value
+        """
+
+        names = list(bboxes.keys())
+        boxes = np.array([bboxes[name] for name in names], dtype=np.float64).reshape(-1, 4)
+
+        # Features whose bounding box overlaps a city, shape (features, cities)
+        candidates = (self.feature_bboxes[:, None, 0] < boxes[None, :, 2]) & \
+                     (self.feature_bboxes[:, None, 2] > boxes[None, :, 0]) & \
+                     (self.feature_bboxes[:, None, 1] < boxes[None, :, 3]) & \
+                     (self.feature_bboxes[:, None, 3] > boxes[None, :, 1])
+
+        point_candidates = candidates.any(axis=1)[self.owners]
+        points = self.points[point_candidates]
+        owners = self.owners[point_candidates]
+
+        # Points strictly inside each city, shape (points, cities)
+        lon = points[:, 0, None]
+        lat = points[:, 1, None]
+        inside = (boxes[None, :, 0] < lon) & (lon < boxes[None, :, 2]) & \
+                 (boxes[None, :, 1] < lat) & (lat < boxes[None, :, 3])
+
+        return {name: np.unique(owners[inside[:, c]]) for c, name in enumerate(names)}
+
+
+def flatten_coordinates(coordinates, points):
+    """
+    Collects the coordinate pairs of any GeoJSON geometry nesting level, from a Point to a MultiPolygon.
+    Whole lines of two dimensional coordinates are copied at once, which keeps the Python work per point low.
+    :param coordinates: list, coordinates of a geometry
+    :param points: list, coordinate pairs are appended here
+    :return: None
+    """
+
+    if len(coordinates) == 0:
+        return
+    first = coordinates[0]
+    if not isinstance(first, list):
+        # A single position
+        if len(coordinates) >= 2:
+            points.append(coordinates[:2])
+    elif not isinstance(first[0], list):
+        # A line of positions
+        if all(len(position) == 2 for position in coordinates):
+            points.extend(coordinates)
+        else:
+            points.extend(position[:2] for position in coordinates if len(position) >= 2)
+    else:
+        for part in coordinates:
+            flatten_coordinates(part, points)
@@ -0,0 +1,175 @@
+"""
+This file implements incremental parsing of large GeoJSON responses.
+
+It is a part of the model of the application.
+
+Instead of materializing the whole response with response.json(), the features of a FeatureCollection are
+decoded one at a time while the response is being read from the socket. Only the current feature and the
+unparsed part of the latest chunk are held in memory, so the caller can pick the properties it needs from each
+feature and let the rest be garbage collected.
+"""
+
+import codecs
+import json
+import time
+
+from instrumentation import instrumentation
+
+default_chunk_size = 64 * 1024
+
+whitespace = " \t\n\r"
+delimiters = whitespace + ",]}"
+
+
+class FeatureStream:
+
+    def __init__(self, chunks):
+        """
+        :param chunks: iterable of bytes, the response body in chunks
+        """
+
+        self.chunks = iter(chunks)
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.json_decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.position = 0
+        self.finished = False
+
+
+    def read_more(self):
+        """
+        Appends the next chunk to the buffer and drops the part that has already been parsed
+        :return: bool, False if the response has ended
+        """
+
+        if self.finished:
+            return False
+
+        chunk = next(self.chunks, None)
+        if chunk is None:
+            self.finished = True
+            text = self.decoder.decode(b"", final=True)
+        else:
+            text = self.decoder.decode(chunk)
+
+        self.buffer = self.buffer[self.position:] + text
+        self.position = 0
+        return True
+
+
+    def skip_whitespace(self):
+        """
+        Moves past whitespace, reading more data if needed
+        :return: str, the next character or "" at the end of the response
+        """
+
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position] in whitespace:
+                self.position += 1
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self.read_more():
+                return ""
+
+
+    def expect(self, characters):
+        """
+        Consumes the next non-whitespace character, which must be one of the given characters
+        :param characters: str, allowed characters
+        :return: str, the consumed character
+        """
+
+        character = self.skip_whitespace()
+        if character == "" or character not in characters:
+            raise ValueError("Expected one of %r at position %d, got %r" % (characters, self.position, character))
+        self.position += 1
+        return character
+
+
+    def decode_value(self):
+        """
+        Decodes the next JSON value, reading more data until the value is complete
+        :return: the decoded value
+        """
+
+        self.skip_whitespace()
+        while True:
+            try:
+                value, end = self.json_decoder.raw_decode(self.buffer, self.position)
+            except json.JSONDecodeError:
+                if not self.read_more():
+                    raise
+                continue
+            # A number that is not followed by a delimiter may continue in the next chunk
+            if not isinstance(value, (dict, list, str)) and \
+                    (end == len(self.buffer) or self.buffer[end] not in delimiters) and self.read_more():
+                continue
+            self.position = end
+            return value
+
+
+    def features(self, key="features"):
+        """
+        Yields the items of the array under the given key of the top level object, one at a time.
+        Other top level values are decoded and skipped.
+        :param key: str, key of the array
+        :return: generator of decoded items
+        """
+
+        self.expect("{")
+        if self.skip_whitespace() == "}":
+            raise ValueError("Response has no %s" % key)
+
+        while True:
+            name = self.decode_value()
+            self.expect(":")
+            if name == key:
+                break
+            self.decode_value()
+            if self.expect(",}") == "}":
+                raise ValueError("Response has no %s" % key)
+
+        self.expect("[")
+        if self.skip_whitespace() == "]":
+            self.position += 1
+            return
+        while True:
+            yield self.decode_value()
+            if self.expect(",]") == "]":
+                return
+
+
+def iter_features(response, chunk_size=default_chunk_size):
+    """
+    Streams the features of a GeoJSON response one at a time. The response should be requested with stream=True.
+    The response is closed when the features have been read or the generator is closed.
+    :param response: requests.Response
+    :param chunk_size: int, size of the chunks read from the socket
+    :return: generator of features
+    """
+
+    # The stream is read while the caller handles the features, so the download is recorded when it ends instead
+    # of as a span around it
+    source = instrumentation.current_source() or "unknown"
+    start = time.perf_counter()
+    received = [0]
+    try:
+        response.raise_for_status()
+        yield from FeatureStream(counted_chunks(response.iter_content(chunk_size=chunk_size), received)).features()
+    finally:
+        response.close()
+        instrumentation.record(source, "download", (time.perf_counter() - start) * 1000,
+                               url=response.url.split("?")[0], bytes=received[0])
+
+
+def counted_chunks(chunks, received):
+    """
+    Counts the bytes of the chunks as they are read
+    :param chunks: iterable of bytes
+    :param received: list, the number of read bytes is added to its first item
+    :return: generator of the chunks
+    """
+
+    for chunk in chunks:
+        received[0] += len(chunk)
+        yield chunk
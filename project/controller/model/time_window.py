@@ -0,0 +1,203 @@
+"""
+This file implements the time windows of the requests.
+
+It is a part of the model of the application.
+
+A TimeWindow is a half-open window [start, end). Windows relative to the current time are rounded to the natural
+step of the data source, so that searches made minutes apart request the same window and share the cached
+response. The current time is read from a pluggable clock, which tests can replace with set_clock.
+
+A RelativeWindow describes a window relative to the current time without fixing it, so it can be used as a
+default argument. It is resolved into a TimeWindow when the request is made.
+"""
+
+from datetime import datetime
+from datetime import timedelta
+
+from .range_planner import alignment_origin, split_window
+
+request_time_format = "%Y-%m-%dT%H:%M:%SZ"
+
+clock = datetime.now
+
+
+def set_clock(new_clock):
+    """
+    Replaces the clock used for the current time
+    :param new_clock: callable without arguments returning a datetime, or None for the system clock
+    :return: None
+    """
+
+    global clock
+    clock = new_clock or datetime.now
+
+
+def now():
+    """
+    :return: datetime, the current time from the clock
+    """
+
+    return clock()
+
+
+def floor_time(time, step):
+    """
+    Rounds a time down to a whole multiple of the step
+    :param time: datetime
+    :param step: timedelta
+    :return: datetime
+    """
+
+    return alignment_origin + (time - alignment_origin) // step * step
+
+
+def ceil_time(time, step):
+    """
+    Rounds a time up to a whole multiple of the step
+    :param time: datetime
+    :param step: timedelta
+    :return: datetime
+    """
+
+    floored = floor_time(time, step)
+    return floored if floored == time else floored + step
+
+
+class TimeWindow:
+
+    __slots__ = ("start", "end")
+
+    def __init__(self, start, end):
+        """
+        :param start: datetime, start of the window
+        :param end: datetime, end of the window, not included
+        """
+
+        self.start = start
+        self.end = end
+
+
+    @classmethod
+    def from_now(cls, start_offset, end_offset, step):
+        """
+        Window relative to the current time. The start is rounded down to the step and the length is kept.
+        :param start_offset: timedelta, start relative to the current time
+        :param end_offset: timedelta, end relative to the current time
+        :param step: timedelta, natural step of the data source
+        :return: TimeWindow
+        """
+
+        start = floor_time(now() + start_offset, step)
+        return cls(start, start + (end_offset - start_offset))
+
+
+    @classmethod
+    def days(cls, first_day, last_day):
+        """
+        Window of whole days
+        :param first_day: datetime or date, first day
+        :param last_day: datetime or date, last day, included
+        :return: TimeWindow from the midnight of the first day to the midnight after the last day
+        """
+
+        first = datetime(first_day.year, first_day.month, first_day.day)
+        last = datetime(last_day.year, last_day.month, last_day.day)
+        return cls(first, last + timedelta(days=1))
+
+
+    def resolve(self):
+        """
+        :return: TimeWindow, this window. See RelativeWindow.resolve.
+        """
+
+        return self
+
+
+    def rounded(self, step):
+        """
+        :param step: timedelta
+        :return: TimeWindow, the smallest window of whole steps containing this window
+        """
+
+        return TimeWindow(floor_time(self.start, step), ceil_time(self.end, step))
+
+
+    def split(self, chunk_size):
+        """
+        Splits the window into aligned chunks, see range_planner.split_window
+        :param chunk_size: timedelta, maximum length of a chunk
+        :return: list of TimeWindow in time order
+        """
+
+        return [TimeWindow(start, end) for start, end in split_window(self.start, self.end, chunk_size)]
+
+
+    def last(self, step):
+        """
+        Last time step inside the window, for APIs whose end time is included
+        :param step: timedelta
+        :return: datetime
+        """
+
+        return self.end - step
+
+
+    def start_string(self):
+        """
+        :return: str, start in the format of the API requests
+        """
+
+        return self.start.strftime(request_time_format)
+
+
+    def end_string(self):
+        """
+        :return: str, end in the format of the API requests
+        """
+
+        return self.end.strftime(request_time_format)
+
+
+    def __eq__(self, other):
+        return isinstance(other, TimeWindow) and self.start == other.start and self.end == other.end
+
+
+    def __hash__(self):
+        return hash((self.start, self.end))
+
+
+    def __str__(self):
+        # Used in the cache keys
+        return self.start.isoformat() + "/" + self.end.isoformat()
+
+
+    def __repr__(self):
+        return "TimeWindow(%r, %r)" % (self.start, self.end)
+
+
+class RelativeWindow:
+
+    __slots__ = ("start_offset", "end_offset", "step")
+
+    def __init__(self, start_offset, end_offset, step):
+        """
+        :param start_offset: timedelta, start relative to the current time
+        :param end_offset: timedelta, end relative to the current time
+        :param step: timedelta, natural step of the data source
+        """
+
+        self.start_offset = start_offset
+        self.end_offset = end_offset
+        self.step = step
+
+
+    def resolve(self):
+        """
+        :return: TimeWindow at the current time, see TimeWindow.from_now
+        """
+
+        return TimeWindow.from_now(self.start_offset, self.end_offset, self.step)
+
+
+    def __repr__(self):
+        return "RelativeWindow(%r, %r, %r)" % (self.start_offset, self.end_offset, self.step)
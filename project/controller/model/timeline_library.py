@@ -0,0 +1,119 @@
+"""
+This file implements the index of saved timelines.
+
+It is a part of the model of the application.
+
+The city, the date range, the saved data sources and the size of every timeline file are kept in a SQLite
+database in the timelines folder. The index is updated when a timeline is saved, so the saved timelines can be
+searched by city and overlapping dates without opening the files. Files that are added or removed outside the
+application are picked up by synchronize.
+"""
+
+import pathlib
+import sqlite3
+
+library_file_name = "library.sqlite"
+# timeline_store.timeline_suffix and the old json timelines. timeline_store needs numpy, so it is imported only
+# when a file has to be read.
+timeline_suffixes = [".timeline", ".json"]
+
+
+class TimelineLibrary:
+
+    def __init__(self, folder):
+        """
+        :param folder: pathlib.Path, folder of the timeline files
+        """
+
+        self.folder = pathlib.Path(folder)
+        self.connection = None
+
+
+    def connect(self):
+        """
+        Opens the database on first use and creates the table if needed
+        :return: sqlite3.Connection
+        """
+
+        if self.connection is None:
+            self.folder.mkdir(parents=True, exist_ok=True)
+            self.connection = sqlite3.connect(str(self.folder / library_file_name))
+            self.connection.execute("CREATE TABLE IF NOT EXISTS timelines ("
+                                    "name TEXT PRIMARY KEY, city TEXT, start_date TEXT, end_date TEXT, "
+                                    "sources TEXT, size INTEGER, modified REAL)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS timelines_city_dates "
+                                    "ON timelines (city, start_date, end_date)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS timelines_dates ON timelines (start_date, end_date)")
+            self.connection.commit()
+        return self.connection
+
+
+    def add(self, path, settings, sources):
+        """
+        Adds a timeline to the index or updates it
+        :param path: pathlib.Path, timeline file in the folder
+        :param settings: dict, settings of the timeline
+        :param sources: list, names of the saved data sources
+        :return: None
+        """
+
+        stat = path.stat()
+        connection = self.connect()
+        with connection:
+            connection.execute("INSERT OR REPLACE INTO timelines VALUES (?, ?, ?, ?, ?, ?, ?)",
+                               (path.name, settings["city"], settings["startDate"], settings["endDate"],
+                                ",".join(sources), stat.st_size, stat.st_mtime))
+
+
+    def synchronize(self):
+        """
+        Indexes the timeline files that are not in the index or have changed, and removes the files that no
+        longer exist. Files that cannot be read are left out.
+        :return: None
+        """
+
+        connection = self.connect()
+        indexed = dict(connection.execute("SELECT name, modified FROM timelines"))
+        files = {path.name: path for path in self.folder.iterdir() if path.suffix in timeline_suffixes}
+
+        with connection:
+            connection.executemany("DELETE FROM timelines WHERE name = ?",
+                                   [(name,) for name in indexed if name not in files])
+        for name, path in files.items():
+            if indexed.get(name) == path.stat().st_mtime:
+                continue
+            try:
+                from .timeline_store import read_timeline
+                timeline = read_timeline(path)
+                self.add(path, timeline.settings, list(timeline.sources.keys()))
+            except (OSError, ValueError, KeyError, TypeError):
+                continue
+
+
+    def find(self, city=None, start_date=None, end_date=None):
+        """
+        Searches the timelines
+        :param city: str or None, city of the timelines. None finds all cities.
+        :param start_date: str or None, ISO date. Finds timelines that end on this day or later.
+        :param end_date: str or None, ISO date. Finds timelines that start on this day or earlier.
+        :return: list of dicts with the name, city, startDate, endDate, sources and size of every timeline
+        """
+
+        conditions = []
+        parameters = []
+        if city is not None:
+            conditions.append("city = ?")
+            parameters.append(city)
+        if start_date is not None:
+            conditions.append("end_date >= ?")
+            parameters.append(start_date)
+        if end_date is not None:
+            conditions.append("start_date <= ?")
+            parameters.append(end_date)
+        where = " WHERE " + " AND ".join(conditions) if conditions else ""
+
+        rows = self.connect().execute("SELECT name, city, start_date, end_date, sources, size FROM timelines" +
+                                      where + " ORDER BY city, start_date, end_date, name", parameters)
+        return [{"name": name, "city": city, "startDate": start, "endDate": end,
+                 "sources": sources.split(",") if sources else [], "size": size}
+                for name, city, start, end, sources, size in rows]
@@ -0,0 +1,178 @@
+"""
+This file implements the binary file format of saved timelines.
+
+It is a part of the model of the application.
+
+A timeline file contains the settings of the search and the fetched data. The file starts with a short magic
+string, the length of a JSON header and the header itself. The header describes the data sources and where their
+arrays are in the rest of the file. Every array starts at an offset aligned to 64 bytes, so the whole file can be
+memory mapped and the arrays used as zero-copy NumPy views: opening a timeline of several weeks only reads the
+header. Weather data is stored as the columns of its TimeSeries. The other sources are nested dictionaries and are
+stored as UTF-8 JSON blobs that are decoded only when the source is used.
+
+Old timelines saved in json format, with the settings only, can still be opened.
+"""
+
+import json
+import os
+import struct
+
+import numpy as np
+
+from .timeseries import TimeSeries
+
+timeline_suffix = ".timeline"
+timeline_magic = b"RWTL"
+timeline_version = 1
+alignment = 64
+
+# Sources that are not saved, the weather camera image is not a part of the history
+unsaved_sources = ["roadCamera"]
+
+
+def aligned(offset):
+    """
+    :param offset: int, byte offset
+    :return: int, the next offset aligned to the alignment
+    """
+
+    return (offset + alignment - 1) // alignment * alignment
+
+
+def write_timeline(path, settings, data):
+    """
+    Writes a timeline into a file. The file is replaced atomically.
+    :param path: pathlib.Path, file to write
+    :param settings: dict, settings of the search from the side panel
+    :param data: dict, data source name as key and the fetched data as value
+    :return: list, names of the saved data sources
+    """
+
+    arrays = []
+    sources = {}
+    for source, content in data.items():
+        if source in unsaved_sources or content is None:
+            continue
+        if isinstance(content, TimeSeries):
+            sources[source] = {"kind": "timeseries", "station": content.station, "units": content.units,
+                               "parameters": content.parameters}
+            arrays.append((source + "/times", content.times))
+            arrays += [(source + "/" + name, values) for name, values in content.columns.items()]
+        else:
+            sources[source] = {"kind": "json"}
+            arrays.append((source + "/json", np.frombuffer(json.dumps(content).encode("utf-8"), dtype=np.uint8)))
+
+    # The header does not depend on its own length, so the offsets are counted from the start of the data
+    offset = 0
+    array_headers = {}
+    for name, array in arrays:
+        array = np.ascontiguousarray(array)
+        array_headers[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset = aligned(offset + array.nbytes)
+
+    header = json.dumps({"version": timeline_version, "settings": settings, "sources": sources,
+                         "arrays": array_headers}).encode("utf-8")
+    data_start = aligned(len(timeline_magic) + 4 + len(header))
+
+    temporary_path = path.with_name(path.name + ".tmp")
+    with open(temporary_path, "wb") as file:
+        file.write(timeline_magic + struct.pack("<I", len(header)) + header)
+        for name, array in arrays:
+            file.seek(data_start + array_headers[name]["offset"])
+            file.write(np.ascontiguousarray(array).tobytes())
+        file.truncate(data_start + offset)
+    try:
+        # Fails on Windows while the file is memory mapped, see Timeline.close
+        os.replace(temporary_path, path)
+    except OSError:
+        os.remove(temporary_path)
+        raise
+    return list(sources.keys())
+
+
+def read_timeline(path):
+    """
+    Opens a saved timeline
+    :param path: pathlib.Path, timeline file or an old json timeline
+    :return: Timeline
+    """
+
+    with open(path, "rb") as file:
+        magic = file.read(len(timeline_magic))
+        if magic != timeline_magic:
+            file.seek(0)
+            return Timeline(json.load(file)["settings"], {}, {}, None)
+        header_length = struct.unpack("<I", file.read(4))[0]
+        header = json.loads(file.read(header_length).decode("utf-8"))
+
+    if header["version"] > timeline_version:
+        raise ValueError("Timeline %s has an unsupported version %d" % (path, header["version"]))
+
+    data_start = aligned(len(timeline_magic) + 4 + header_length)
+    buffer = np.memmap(path, dtype=np.uint8, mode="r") if header["arrays"] else None
+    arrays = {}
+    for name, array_header in header["arrays"].items():
+        dtype = np.dtype(array_header["dtype"])
+        count = int(np.prod(array_header["shape"]))
+        start = data_start + array_header["offset"]
+        arrays[name] = buffer[start:start + count * dtype.itemsize].view(dtype).reshape(array_header["shape"])
+    return Timeline(header["settings"], header["sources"], arrays, path)
+
+
+class Timeline:
+
+    def __init__(self, settings, sources, arrays, path):
+        """
+        :param settings: dict, settings of the search
+        :param sources: dict, data source name as key and its description from the header as value
+        :param arrays: dict, array name as key and a memory mapped array as value
+        :param path: pathlib.Path or None, file of the timeline
+        """
+
+        self.settings = settings
+        self.sources = sources
+        self.arrays = arrays
+        self.path = path
+        self.decoded = {}
+
+
+    def get(self, source):
+        """
+        Returns the data of a source. Timeseries are views of the file, json blobs are decoded on first use.
+        :param source: str, name of the data source
+        :return: data in the same format as it was fetched, or None if the source was not saved
+        """
+
+        if source not in self.sources:
+            return None
+        if source not in self.decoded:
+            description = self.sources[source]
+            if description["kind"] == "timeseries":
+                columns = {name: self.arrays[source + "/" + name] for name in description["parameters"]}
+                self.decoded[source] = TimeSeries(description["station"], self.arrays[source + "/times"], columns,
+                                                  description["units"])
+            else:
+                self.decoded[source] = json.loads(self.arrays[source + "/json"].tobytes().decode("utf-8"))
+        return self.decoded[source]
+
+
+    def data(self):
+        """
+        :return: dict, data source name as key and the data as value for every saved source
+        """
+
+        return {source: self.get(source) for source in self.sources}
+
+
+    def close(self):
+        """
+        Copies the arrays into memory and releases the memory mapping, so that the file can be replaced.
+        The timeseries that have already been returned are updated to use the copies.
+        :return: None
+        """
+
+        self.arrays = {name: np.array(array) for name, array in self.arrays.items()}
+        for source, content in self.decoded.items():
+            if isinstance(content, TimeSeries):
+                content.times = self.arrays[source + "/times"]
+                content.columns = {name: self.arrays[source + "/" + name] for name in content.columns}
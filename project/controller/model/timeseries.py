@@ -0,0 +1,196 @@
+"""
+This file implements the timeseries container of the model.
+
+It is a part of the model of the application.
+
+fmiopendata returns nested dictionaries of station -> parameter -> {"values": [...]} with a list of datetime
+objects. A TimeSeries holds the same data in columns instead: a sorted NumPy datetime64 time axis and a float32
+array for every parameter. Missing measurements are NaN. Slicing by a time window returns views without copying,
+and resampling and merging are vectorized.
+"""
+
+from datetime import datetime
+from datetime import timedelta
+
+import numpy as np
+
+time_unit = "datetime64[s]"
+
+
+def to_datetime64(time):
+    """
+    Converts a datetime or datetime64 into datetime64 in seconds
+    :param time: datetime, numpy.datetime64 or str in ISO format
+    :return: numpy.datetime64
+    """
+
+    return np.datetime64(time, "s")
+
+
+def to_timedelta64(step):
+    """
+    Converts a timedelta or timedelta64 into timedelta64 in seconds
+    :param step: timedelta or numpy.timedelta64
+    :return: numpy.timedelta64
+    """
+
+    if isinstance(step, timedelta):
+        return np.timedelta64(int(step.total_seconds()), "s")
+    return step.astype("timedelta64[s]")
+
+
+class TimeSeries:
+
+    __slots__ = ("station", "times", "columns", "units")
+
+    def __init__(self, station, times, columns, units=None):
+        """
+        :param station: str, name of the station or location
+        :param times: array-like of datetimes, sorted in ascending order
+        :param columns: dict, parameter name as key and array-like of values as value, in the same order as times
+        :param units: dict, parameter name as key and unit as value
+        """
+
+        self.station = station
+        self.times = np.asarray(times, dtype=time_unit)
+        self.columns = {name: np.asarray(values, dtype=np.float32) for name, values in columns.items()}
+        self.units = dict(units or {})
+
+
+    @classmethod
+    def from_fmi(cls, data, station=None):
+        """
+        Builds a timeseries from the data of an fmiopendata multipoint query made with timeseries=True
+        :param data: dict, station as key and a dictionary with "times" and the parameters as value
+        :param station: str or None, station to be used. Default None uses the first station.
+        :return: TimeSeries, empty if there is no data
+        """
+
+        if not data:
+            return cls(station, [], {})
+        if station is None:
+            station = next(iter(data))
+        series = data[station]
+
+        times = np.array(series["times"], dtype=time_unit)
+        columns = {}
+        units = {}
+        for name, values in series.items():
+            if name == "times":
+                continue
+            columns[name] = np.array(values["values"], dtype=np.float32)
+            units[name] = values.get("unit")
+
+        order = np.argsort(times, kind="stable")
+        return cls(station, times[order], {name: values[order] for name, values in columns.items()}, units)
+
+
+    @property
+    def parameters(self):
+        """
+        :return: list, names of the parameters in their original order
+        """
+
+        return list(self.columns.keys())
+
+
+    def __len__(self):
+        return len(self.times)
+
+
+    def __getitem__(self, parameter):
+        return self.columns[parameter]
+
+
+    def datetimes(self):
+        """
+        :return: list of datetime objects of the time axis
+        """
+
+        return self.times.astype(datetime).tolist()
+
+
+    def slice(self, start=None, end=None):
+        """
+        Returns the part of the timeseries inside a time window. The arrays are views, nothing is copied.
+        :param start: datetime or None, first time included. None means from the beginning.
+        :param end: datetime or None, first time excluded. None means until the end.
+        :return: TimeSeries
+        """
+
+        first = 0 if start is None else np.searchsorted(self.times, to_datetime64(start), side="left")
+        last = len(self.times) if end is None else np.searchsorted(self.times, to_datetime64(end), side="left")
+        return TimeSeries(self.station, self.times[first:last],
+                          {name: values[first:last] for name, values in self.columns.items()}, self.units)
+
+
+    def resample(self, step, origin=None):
+        """
+        Averages the values into bins of equal length. Missing values are ignored, bins without any times are
+        left out and bins with only missing values get NaN.
+        :param step: timedelta, length of a bin
+        :param origin: datetime or None, start of the first bin. Default None starts from the first time.
+        :return: TimeSeries with the start time of every bin as its time axis
+        """
+
+        if len(self.times) == 0:
+            return TimeSeries(self.station, [], {name: [] for name in self.columns}, self.units)
+
+        step = to_timedelta64(step)
+        origin = self.times[0] if origin is None else to_datetime64(origin)
+        bins = (self.times - origin) // step
+        used, index = np.unique(bins, return_inverse=True)
+
+        columns = {}
+        for name, values in self.columns.items():
+            valid = ~np.isnan(values)
+            sums = np.bincount(index[valid], weights=values[valid], minlength=len(used))
+            counts = np.bincount(index[valid], minlength=len(used))
+            with np.errstate(invalid="ignore", divide="ignore"):
+                columns[name] = (sums / counts).astype(np.float32)
+
+        return TimeSeries(self.station, origin + used * step, columns, self.units)
+
+
+    def merge(self, other):
+        """
+        Merges two timeseries of the same station into one ordered timeseries. For times that are in both,
+        the values of this timeseries are kept. Parameters missing from one of them are filled with NaN.
+        :param other: TimeSeries
+        :return: TimeSeries
+        """
+
+        return TimeSeries.concatenate([self, other])
+
+
+    @classmethod
+    def concatenate(cls, parts):
+        """
+        Merges several timeseries of the same station into one ordered timeseries, see merge
+        :param parts: list of TimeSeries
+        :return: TimeSeries
+        """
+
+        parts = [part for part in parts if len(part) > 0] or parts[:1]
+        if not parts:
+            return cls(None, [], {})
+
+        names = []
+        units = {}
+        for part in parts:
+            for name in part.parameters:
+                if name not in names:
+                    names.append(name)
+            units.update({name: unit for name, unit in part.units.items() if name not in units})
+
+        times = np.concatenate([part.times for part in parts])
+        columns = {name: np.concatenate([part.columns[name] if name in part.columns
+                                         else np.full(len(part), np.nan, dtype=np.float32) for part in parts])
+                   for name in names}
+
+        order = np.argsort(times, kind="stable")
+        times = times[order]
+        keep = np.ones(len(times), dtype=bool)
+        keep[1:] = times[1:] != times[:-1]
+        return cls(parts[0].station, times[keep], {name: values[order][keep] for name, values in columns.items()},
+                   units)
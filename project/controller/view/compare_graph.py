@@ -0,0 +1,123 @@
+from PyQt5.QtWidgets import *
+from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
+from matplotlib.figure import Figure
+import matplotlib.dates as mdates
+
+"""This class visualizes the comparison of two saved timelines. Both timelines are drawn in the upper plot, the
+    left one with solid lines and the right one with dashed lines, and their difference (right - left) in the lower
+    plot. The comparisons of every alignment are computed by the controller beforehand, so switching the alignment
+    or the shown parameters only changes what is drawn.
+"""
+
+PARAMETER_NAMES = {"t2m": "Temperature °C", "temperature": "Temperature °C",
+                   "ws_10min": "Wind m/s", "windspeedms": "Wind m/s",
+                   "n_man": "Clouds /8"}
+PARAMETER_COLORS = ["r", "k", "b", "g", "m"]
+ALIGNMENT_NAMES = {"relative": "Align by day of range", "absolute": "Align by date"}
+
+
+class CompareGraphWidget(QWidget):
+    """Widget showing two timelines and their difference in one figure
+
+    Args:
+        QWidget (Class): Class that CompareGraphWidget inherits
+    """
+
+    def __init__(self, comparisons, left_title, right_title):
+        """
+        Args:
+            comparisons (dict): Alignment mode as key and Comparison as value
+            left_title (str): Name of the left timeline
+            right_title (str): Name of the right timeline
+        """
+        super().__init__()
+        self.comparisons = comparisons
+        self.titles = [left_title, right_title]
+        self.mode = None
+        # Artists of the shown alignment, parameter name as key and a list of the artists as value
+        self.artists = {}
+
+        vlayout = QVBoxLayout()
+        hlayout = QHBoxLayout()
+
+        self.alignmentComboBox = QComboBox()
+        for mode in comparisons:
+            self.alignmentComboBox.addItem(ALIGNMENT_NAMES[mode], mode)
+        self.alignmentComboBox.currentIndexChanged.connect(
+            lambda index: self.show_alignment(self.alignmentComboBox.itemData(index)))
+        hlayout.addWidget(self.alignmentComboBox)
+
+        # Buttons to select the shown parameters
+        self.parameterButtons = {}
+        for parameter in next(iter(comparisons.values())).parameters:
+            button = QPushButton(PARAMETER_NAMES.get(parameter, parameter))
+            button.setCheckable(True)
+            button.setChecked(True)
+            button.toggled.connect(self.set_visibility)
+            hlayout.addWidget(button)
+            self.parameterButtons[parameter] = button
+        vlayout.addLayout(hlayout)
+
+        self.figure = Figure()
+        self.valueAxes = self.figure.add_subplot(2, 1, 1)
+        self.deltaAxes = self.figure.add_subplot(2, 1, 2, sharex=self.valueAxes)
+        self.canvas = FigureCanvasQTAgg(self.figure)
+        vlayout.addWidget(self.canvas)
+        self.setLayout(vlayout)
+
+        self.setMinimumSize(900, 600)
+        self.show_alignment(self.alignmentComboBox.itemData(0))
+
+    def show_alignment(self, mode):
+        """Draws the comparison of an alignment
+
+        Args:
+            mode (str): Alignment mode, "relative" or "absolute"
+        """
+        comparison = self.comparisons[mode]
+        self.mode = mode
+        self.valueAxes.cla()
+        self.deltaAxes.cla()
+        self.artists = {}
+
+        if comparison.mode == "relative":
+            x = comparison.grid / 86400
+            self.deltaAxes.set_xlabel("Days since the start of the timeline")
+        else:
+            x = comparison.grid
+            self.deltaAxes.xaxis.set_major_formatter(mdates.DateFormatter("%d/%m/%Y"))
+            self.deltaAxes.set_xlabel("Date")
+
+        for i, parameter in enumerate(comparison.parameters):
+            color = PARAMETER_COLORS[i % len(PARAMETER_COLORS)]
+            name = PARAMETER_NAMES.get(parameter, parameter)
+            self.artists[parameter] = [
+                self.valueAxes.plot(x, comparison.left[parameter], color=color, linestyle='-',
+                                    label=name + " " + self.titles[0])[0],
+                self.valueAxes.plot(x, comparison.right[parameter], color=color, linestyle='--',
+                                    label=name + " " + self.titles[1])[0],
+                self.deltaAxes.plot(x, comparison.delta[parameter], color=color, label=name)[0]]
+
+        self.deltaAxes.axhline(0, color='grey', linewidth=0.8)
+        self.valueAxes.set_title(self.titles[0] + " (solid) and " + self.titles[1] + " (dashed)")
+        self.deltaAxes.set_title("Difference, " + self.titles[1] + " - " + self.titles[0])
+        self.set_visibility()
+
+    def set_visibility(self):
+        """Shows the artists of the selected parameters and rescales the axes. Nothing is recomputed.
+        """
+        for parameter, artists in self.artists.items():
+            visible = self.parameterButtons[parameter].isChecked()
+            for artist in artists:
+                artist.set_visible(visible)
+
+        for axes in [self.valueAxes, self.deltaAxes]:
+            axes.relim(visible_only=True)
+            axes.autoscale_view()
+            handles = [line for line in axes.get_lines() if line.get_visible() and
+                       not line.get_label().startswith('_')]
+            if handles:
+                axes.legend(handles=handles, loc='best', fontsize='small')
+            elif axes.get_legend() is not None:
+                axes.get_legend().remove()
+        self.canvas.draw_idle()
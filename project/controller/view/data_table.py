@@ -0,0 +1,272 @@
+"""
+This class shows the traffic messages, road maintenance and road conditions as sortable and filterable tables.
+
+It is a part of the view of the application.
+
+The rows are kept as the columns of the data from the controller. The text of a cell is made only when the table
+view asks for it, which is only for the visible rows, and the rows are given to the view in batches as it is
+scrolled. Sorting and filtering reorder the row indices without creating any widgets, so the cost of showing a
+result does not grow with its size.
+"""
+
+from PyQt5 import QtCore
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex
+from PyQt5.QtWidgets import QWidget, QLabel, QLineEdit, QTableView, QVBoxLayout, QHeaderView, QAbstractItemView
+
+# Number of rows given to the view at a time
+ROW_BATCH_SIZE = 256
+
+road_condition_horizon_header = "Forecast"
+
+
+def cell_text(value):
+    """
+    :param value: value of a cell
+    :return: str, text of the cell. Lists are joined and missing values are empty.
+    """
+
+    if value is None:
+        return ""
+    if isinstance(value, list):
+        return ", ".join(cell_text(item) for item in value)
+    if isinstance(value, float):
+        return "%.2f" % value
+    return str(value)
+
+
+def sort_key(value):
+    """
+    :param value: value of a cell
+    :return: tuple, numbers are sorted by their value before the texts, and missing values come last
+    """
+
+    if isinstance(value, list):
+        value = value[0] if len(value) == 1 else cell_text(value)
+    if value is None or value == "":
+        return 2, 0.0, ""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return 0, float(value), ""
+    return 1, 0.0, str(value).lower()
+
+
+def source_table(source, content, city):
+    """
+    Arranges the data of a source into columns
+    :param source: str, name of the data source, trafficMessages, roadMaintenance or roadCondition
+    :param content: dict, data of the source from the controller
+    :param city: str, city in all caps
+    :return: list of headers and list of columns, every column a list of values
+    """
+
+    data = content[city]
+    if source == 'trafficMessages':
+        return ["Situation type", "Name", "Comment"], [data["situationType"], data["name"], data["comment"]]
+    if source == 'roadMaintenance':
+        return ["Tasks", "Start time", "End time"], [data["tasks"], data["startTime"], data["endTime"]]
+
+    # Road condition, a row for every forecast horizon with data and a column for every field
+    horizons = [horizon for horizon, summary in data.items() if any(len(values) > 0 for values in summary.values())]
+    fields = []
+    for horizon in horizons:
+        fields += [field for field in data[horizon] if field not in fields]
+    columns = [horizons] + [[data[horizon].get(field) for horizon in horizons] for field in fields]
+    return [road_condition_horizon_header] + fields, columns
+
+
+class RecordTableModel(QAbstractTableModel):
+
+    def __init__(self, headers, columns):
+        """
+        :param headers: list, header of every column
+        :param columns: list, every column as a list of values of the same length
+        """
+
+        super().__init__()
+
+        self.headers = headers
+        self.columns = columns
+        self.row_total = len(columns[0]) if columns else 0
+        # Indices of the rows after filtering and sorting, and the number of rows given to the view
+        self.order = list(range(self.row_total))
+        self.loaded = min(ROW_BATCH_SIZE, len(self.order))
+        self.sort_column = None
+        self.sort_order = QtCore.Qt.AscendingOrder
+        self.filter_text = ""
+        # Lowercase text of every row, made on the first filtering
+        self.row_texts = None
+
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.loaded
+
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.headers)
+
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        value = self.columns[index.column()][self.order[index.row()]]
+        if role == QtCore.Qt.DisplayRole:
+            return cell_text(value)
+        if role == QtCore.Qt.ToolTipRole and index.column() == len(self.headers) - 1:
+            # The last column is usually the longest text
+            return cell_text(value)
+        return None
+
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if role != QtCore.Qt.DisplayRole:
+            return None
+        if orientation == QtCore.Qt.Horizontal:
+            return self.headers[section]
+        return str(section + 1)
+
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self.loaded < len(self.order)
+
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        count = min(ROW_BATCH_SIZE, len(self.order) - self.loaded)
+        if count <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self.loaded, self.loaded + count - 1)
+        self.loaded += count
+        self.endInsertRows()
+
+
+    def sort(self, column, order=QtCore.Qt.AscendingOrder):
+        """
+        Sorts the rows by a column
+        :param column: int, index of the column, or -1 for the original order
+        :param order: Qt.SortOrder
+        :return: None
+        """
+
+        self.sort_column = column if 0 <= column < len(self.headers) else None
+        self.sort_order = order
+        self.reorder()
+
+
+    def set_filter(self, text):
+        """
+        Shows only the rows that contain the text in any column
+        :param text: str, text to be searched, case insensitive
+        :return: None
+        """
+
+        self.filter_text = text.strip().lower()
+        self.reorder()
+
+
+    def reorder(self):
+        """
+        Applies the filter and the sorting to the row indices and gives the first batch of rows to the view
+        :return: None
+        """
+
+        self.beginResetModel()
+        rows = range(self.row_total)
+        if self.filter_text:
+            if self.row_texts is None:
+                self.row_texts = ["\t".join(cell_text(column[row]) for column in self.columns).lower()
+                                  for row in rows]
+            rows = [row for row in rows if self.filter_text in self.row_texts[row]]
+        rows = list(rows)
+        if self.sort_column is not None:
+            column = self.columns[self.sort_column]
+            rows.sort(key=lambda row: sort_key(column[row]), reverse=self.sort_order == QtCore.Qt.DescendingOrder)
+        self.order = rows
+        self.loaded = min(ROW_BATCH_SIZE, len(rows))
+        self.endResetModel()
+
+
+class DataTable(QWidget):
+
+    def __init__(self, text):
+        """
+        :param text: str, text shown until the data is set
+        """
+
+        super().__init__()
+
+        self.model = None
+        vBox = QVBoxLayout(self)
+        vBox.setContentsMargins(0, 0, 0, 0)
+
+        self.filter_edit = QLineEdit()
+        self.filter_edit.setPlaceholderText("Filter")
+        self.filter_edit.setClearButtonEnabled(True)
+        self.filter_edit.textChanged.connect(self.filter_changed)
+        vBox.addWidget(self.filter_edit)
+
+        self.table_view = QTableView()
+        self.table_view.setSortingEnabled(True)
+        self.table_view.setAlternatingRowColors(True)
+        self.table_view.setWordWrap(False)
+        self.table_view.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table_view.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table_view.horizontalHeader().setStretchLastSection(True)
+        self.table_view.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)
+        self.table_view.horizontalHeader().setSortIndicator(-1, QtCore.Qt.AscendingOrder)
+        self.table_view.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        vBox.addWidget(self.table_view)
+
+        self.text_label = QLabel(text)
+        vBox.addWidget(self.text_label)
+
+        self.set_text(text)
+
+
+    def set_records(self, headers, columns):
+        """
+        Shows the rows in the table
+        :param headers: list, header of every column
+        :param columns: list, every column as a list of values of the same length
+        :return: None
+        """
+
+        old_model = self.model
+        self.model = RecordTableModel(headers, columns)
+        # The filter and the sorting of the previous data are kept, the rows are ordered once by sort
+        header = self.table_view.horizontalHeader()
+        self.model.filter_text = self.filter_edit.text().strip().lower()
+        self.model.sort(header.sortIndicatorSection(), header.sortIndicatorOrder())
+        self.table_view.setModel(self.model)
+        if old_model is not None:
+            old_model.deleteLater()
+
+        # Only the width of the visible rows is measured
+        for column in range(len(headers) - 1):
+            self.table_view.resizeColumnToContents(column)
+        self.text_label.hide()
+        self.filter_edit.show()
+        self.table_view.show()
+
+
+    def set_text(self, text):
+        """
+        Shows a text instead of the table
+        :param text: str, text to be shown
+        :return: None
+        """
+
+        self.text_label.setText(text)
+        self.filter_edit.hide()
+        self.table_view.hide()
+        self.text_label.show()
+
+
+    def filter_changed(self, text):
+        """
+        Filters the rows of the table
+        :param text: str, text of the filter
+        :return: None
+        """
+
+        if self.model is not None:
+            self.model.set_filter(text)
@@ -3,27 +3,83 @@ This class visualizes the data for the user.
 
 It works as a view for the application.
 It only has access to the controller.
+
+The view is laid out first with a placeholder for every selected data source.
+The controller then fills in the sections one by one as the data arrives.
+New data of a section that has already been filled in updates the existing widgets in place.
+
+The widgets of a view are created once. A new search in the same view shows the sections selected in its settings
+and reuses the existing graph, camera label and tables for the new data. The toolbox of the tables is created again
+only when the selected toolbox sections change.
 """
 
-from PyQt5 import QtWidgets
-from PyQt5.QtWidgets import QWidget, QLabel, QToolBox, QTextBrowser
-from PyQt5.QtGui import QPixmap
-import json
-import pathlib
+from PyQt5 import QtCore, QtWidgets
+from PyQt5.QtWidgets import QWidget, QLabel, QToolBox
+from PyQt5.QtGui import QImage, QPixmap
+from collections import OrderedDict
+
+from .data_table import DataTable, source_table
+
+LOADING_TEXT = "Loading..."
+NOT_SAVED_TEXT = "Not saved in the timeline"
+
+# Sections of the toolbox in their order
+toolbox_sections = [("trafficMessages", "TRAFFIC MESSAGES"), ("roadMaintenance", "ROAD MAINTENANCE"),
+                    ("roadCondition", "ROAD CONDITION")]
+
+# Decoded weather camera images shared by all views, image key from the controller as key
+camera_pixmaps = OrderedDict()
+MAX_CAMERA_PIXMAPS = 16
+CAMERA_IMAGE_WIDTH = 900
+
+
+def decode_camera_image(camera, max_width=CAMERA_IMAGE_WIDTH):
+    """
+    Decodes a weather camera image and scales it down to the display size.
+    Uses QImage instead of QPixmap so it can be called in a worker thread.
+    An image that is already shown as a pixmap is not decoded again. The jpeg bytes are kept with it, because the
+    pixmap can be evicted by the GUI thread before the image is shown, see get_camera_pixmap.
+    :param camera: dict, imageKey tuple and the image as jpeg bytes from the model, or None
+    :param max_width: int, maximum width of the decoded image
+    :return: dict, imageKey tuple, the image as a QImage or None if it was not decoded, and the jpeg bytes, or None
+    if there is no image
+    """
+
+    if camera is None:
+        return None
+    if camera["imageKey"] in camera_pixmaps:
+        return {"imageKey": camera["imageKey"], "image": None, "jpeg": camera["image"]}
+
+    image = QImage.fromData(camera["image"])
+    if image.width() > max_width:
+        image = image.scaledToWidth(max_width, QtCore.Qt.SmoothTransformation)
+    return {"imageKey": camera["imageKey"], "image": image, "jpeg": None}
 
-from .graph import GraphWidget
 
 class DataVisualization(QWidget):
     def __init__(self):
         super().__init__()
 
-
-    def get_view(self, settings, view, data):
+        self.settings = None
+        self.vBox = None
+        self.weather_placeholder = None
+        self.weather_graph = None
+        self.camera_label = None
+        self.toolbox = None
+        # table of every toolbox section, data source name as key
+        self.toolbox_tables = {}
+        # data sources selected in the settings
+        self.sources = []
+        # data shown in the view, data source name as key
+        self.data = {}
+
+
+    def get_view(self, settings, view, data=None):
         """
         Returns the view based on open tab and selected settings
         :param settings: dict, settings from the side panel
         :param view: int, tab index representing one of the three tabs
-        :param data: dict, data from the controller
+        :param data: dict, data from the controller. If None, sections show a loading text until set_data is called
         :return: QWidget, the view for the current tab
         """
 
@@ -32,10 +88,10 @@ class DataVisualization(QWidget):
         elif view == 1:
             return self.get_history_view(settings, data)
         else:
-            return self.get_saved_view()
+            return self.get_saved_view(settings, data)
 
 
-    def get_current_view(self, settings, data):
+    def get_current_view(self, settings, data=None):
         """
         Returns the view for the current day
         :param settings: dict, settings from the side panel
@@ -43,133 +99,206 @@ class DataVisualization(QWidget):
         :return: QWidget, the view for the current tab
         """
 
-        vBox = QtWidgets.QVBoxLayout(self)
+        return self.build_view(settings, data)
+
+
+    def get_history_view(self, settings, data=None):
+        """
+        Returns the view for the history
+        :param settings: dict, settings from the side panel
+        :param data: dict, data from the controller
+        :return: QWidget, the view for the current tab
+        """
+
+        return self.build_view(settings, data)
 
-        #If weather info box in gui is ticked, graph is created, same goes for rest of the data
-        if settings['weatherInfo']:
-            weatherGraph = GraphWidget(data["weatherData"])
-            vBox.addWidget(weatherGraph)
 
-        if settings['roadInfo']['roadCamera']:
-            if data['roadCamera']:
-                label = QLabel(self)
-                path = pathlib.Path.cwd() / 'controller' / 'saves' / 'images' / 'weather_cam.jpg'
-                pixmap = QPixmap(f"{path}")
-                label.setPixmap(pixmap)
-                vBox.addWidget(label)
+    def build_view(self, settings, data=None):
+        """
+        Lays out a section for every data source selected in the settings. The widgets are created on the first call,
+        the following calls show the selected sections again with a loading text.
+        :param settings: dict, settings from the side panel
+        :param data: dict, data from the controller
+        :return: QWidget, the view
+        """
 
-        toolbox = QToolBox()
-        toolbox.setMinimumHeight(400)
-        toolbox.setMaximumWidth(900)
+        if self.vBox is None:
+            self.create_sections()
 
-        if settings['roadInfo']['trafficMessages']:
-            if len(data['trafficMessages'][settings["city"].upper()]['situationType']) > 0:
-                content = data['trafficMessages']
-                trafficMessageStr = json.dumps(content, indent=6)
-                messageStr = trafficMessageStr.replace('(', '').replace(')', '').replace('[', '').replace(']', '').replace('{', '').replace('}', '').replace(',', '').replace('"', '') 
-                messageLabel = QLabel(messageStr)   
-            else:
-                messageLabel = QLabel("None")
+        self.settings = settings
+        self.data = {}
+        #If weather info box in gui is ticked, graph is shown, same goes for rest of the data
+        self.sources = [source for source in ["weatherData", "roadCamera"] + [s for s, _ in toolbox_sections]
+                        if (settings['weatherInfo'] if source == 'weatherData' else settings['roadInfo'][source])]
 
-            toolbox.addItem(messageLabel, "TRAFFIC MESSAGES")
+        self.weather_placeholder.setVisible('weatherData' in self.sources)
+        if self.weather_graph is not None:
+            self.weather_graph.hide()
+        self.camera_label.setVisible('roadCamera' in self.sources)
 
-        if settings['roadInfo']['roadMaintenance']:
-            if len(data['roadMaintenance'][settings["city"].upper()]['tasks']) > 0:
-                content = data['roadMaintenance']
-                maintenanceStr = json.dumps(content, indent=6)
-                maintStr = maintenanceStr.replace('(', '').replace(')', '').replace('[', '').replace(']', '').replace('{', '').replace('}', '').replace(',', '').replace('"', '') 
-                maintenanceLabel = QLabel(maintStr)
-            else:
-                maintenanceLabel = QLabel("None")
+        # The toolbox has no way to hide an item, so it is created again only when the selected sections change
+        if self.toolbox is None or [s for s, _ in toolbox_sections if s in self.sources] != list(self.toolbox_tables):
+            self.create_toolbox()
 
-            toolbox.addItem(maintenanceLabel, "ROAD MAINTENANCE")
+        for source in self.sources:
+            self.set_text(source, LOADING_TEXT)
 
-        if settings['roadInfo']['roadCondition']:
-            if len(data['roadCondition'][settings["city"].upper()]) > 0:
-                content = data['roadCondition']
-                roadConditionStr = json.dumps(content, indent = 8)
-                condStr = roadConditionStr.replace('(', '').replace(')', '').replace('[', '').replace(']', '').replace('{', '').replace('}', '').replace(',', '').replace('"', '')
-                conditionLabel = QLabel(condStr)
-            else:
-                conditionLabel = QLabel(None)
-            toolbox.addItem(conditionLabel, "ROAD CONDITION")
+        if data is not None:
+            for source, content in data.items():
+                self.set_data(source, content)
 
-        vBox.addWidget(toolbox)
-        contents = QtWidgets.QWidget()
-        contents.setLayout(vBox)
+        return self
 
-        return contents
 
-    def get_history_view(self, settings, data):
+    def create_sections(self):
         """
-        Returns the view for the history
-        :param settings: dict, settings from the side panel
-        :return: QWidget, the view for the current tab
+        Creates the weather and camera sections, the toolbox is created by create_toolbox
+        :return: None
         """
-        vBox = QtWidgets.QVBoxLayout(self)
 
-        if settings['weatherInfo']:
-            weatherGraph = GraphWidget(data["weatherData"])
-            vBox.addWidget(weatherGraph)
+        self.vBox = QtWidgets.QVBoxLayout(self)
+
+        self.weather_placeholder = QLabel(LOADING_TEXT)
+        self.vBox.addWidget(self.weather_placeholder)
+
+        self.camera_label = QLabel(LOADING_TEXT)
+        self.vBox.addWidget(self.camera_label)
 
-        if settings['roadInfo']['roadCamera']:
-            if data['roadCamera']:
-                label = QLabel(self)
-                path = pathlib.Path.cwd() / 'controller' / 'saves' / \
-                    'images' / 'weather_cam.jpg'
-                pixmap = QPixmap(f"{path}")
-                label.setPixmap(pixmap)
-                vBox.addWidget(label)
+
+    def create_toolbox(self):
+        """
+        Creates the toolbox with a table for every selected toolbox section. Replaces the previous toolbox.
+        :return: None
+        """
 
         toolbox = QToolBox()
         toolbox.setMinimumHeight(400)
         toolbox.setMaximumWidth(900)
+        self.toolbox_tables = {}
+        for source, title in toolbox_sections:
+            if source in self.sources:
+                self.toolbox_tables[source] = DataTable(LOADING_TEXT)
+                toolbox.addItem(self.toolbox_tables[source], title)
+
+        if self.toolbox is None:
+            self.vBox.addWidget(toolbox)
+        else:
+            self.vBox.replaceWidget(self.toolbox, toolbox)
+            self.toolbox.deleteLater()
+        self.toolbox = toolbox
+        self.toolbox.setVisible(len(self.toolbox_tables) > 0)
 
-        if settings['roadInfo']['trafficMessages']:
-            if len(data['trafficMessages'][settings["city"].upper()]['situationType']) > 0:
-                content = data['trafficMessages']
-                trafficMessageStr = json.dumps(content, indent=6)
-                messageStr = trafficMessageStr.replace('(', '').replace(')', '').replace('[', '').replace(
-                    ']', '').replace('{', '').replace('}', '').replace(',', '').replace('"', '')
-                messageLabel = QLabel(messageStr)
-            else:
-                messageLabel = QLabel("None")
 
-            toolbox.addItem(messageLabel, "TRAFFIC MESSAGES")
+    def set_data(self, source, content):
+        """
+        Fills in the section of a single data source
+        :param source: str, name of the data source
+        :param content: data of the source from the controller
+        :return: None
+        """
 
-        if settings['roadInfo']['roadMaintenance']:
-            if len(data['roadMaintenance'][settings["city"].upper()]['tasks']) > 0:
-                content = data['roadMaintenance']
-                maintenanceStr = json.dumps(content, indent=6)
-                maintStr = maintenanceStr.replace('(', '').replace(')', '').replace('[', '').replace(
-                    ']', '').replace('{', '').replace('}', '').replace(',', '').replace('"', '')
-                maintenanceLabel = QLabel(maintStr)
+        self.data[source] = content
+        if source not in self.sources:
+            return
+
+        if source == 'weatherData':
+            # FMI returns no stations for a window without any observations yet
+            if len(content.parameters) == 0:
+                self.set_text(source, "None")
+                return
+            forecast = len(content.parameters) == 2
+            if self.weather_graph is not None and self.weather_graph.dataTypeForecast == forecast:
+                self.weather_graph.update(content)
             else:
-                maintenanceLabel = QLabel("None")
-
-            toolbox.addItem(maintenanceLabel, "ROAD MAINTENANCE")
+                # The buttons of a graph depend on the type of the data, so a graph of the other type is replaced
+                # matplotlib is imported with the first graph, see warm_up_imports in main_window
+                from .graph import GraphWidget
+                if self.weather_graph is not None:
+                    self.vBox.removeWidget(self.weather_graph)
+                    self.weather_graph.deleteLater()
+                self.weather_graph = GraphWidget(content)
+                self.vBox.insertWidget(self.vBox.indexOf(self.weather_placeholder) + 1, self.weather_graph)
+            self.weather_placeholder.hide()
+            self.weather_graph.show()
+
+        elif source == 'roadCamera':
+            if content is not None:
+                self.camera_label.setPixmap(self.get_camera_pixmap(content))
+            else:
+                self.camera_label.setText("None")
 
-        if settings['roadInfo']['roadCondition']:
-            if len(data['roadCondition'][settings["city"].upper()]) > 0:
-                content = data['roadCondition']
-                roadConditionStr = json.dumps(content, indent=8)
-                condStr = roadConditionStr.replace('(', '').replace(')', '').replace('[', '').replace(
-                    ']', '').replace('{', '').replace('}', '').replace(',', '').replace('"', '')
-                conditionLabel = QLabel(condStr)
+        else:
+            headers, columns = source_table(source, content, self.settings["city"].upper())
+            if len(columns[0]) > 0:
+                self.toolbox_tables[source].set_records(headers, columns)
             else:
-                conditionLabel = QLabel(None)
-            toolbox.addItem(conditionLabel, "ROAD CONDITION")
+                self.toolbox_tables[source].set_text("None")
 
-        vBox.addWidget(toolbox)
-        contents = QtWidgets.QWidget()
-        contents.setLayout(vBox)
 
-        return contents
-        
-    def get_saved_view(self):
+    def get_camera_pixmap(self, camera):
         """
-        Returns the view for the saved data
-        :return: QWidget, the view for the current tab
+        Returns the weather camera image as a pixmap. Images that have already been converted are reused.
+        :param camera: dict, imageKey tuple, the image as a QImage and the jpeg bytes from decode_camera_image
+        :return: QPixmap, the camera image
+        """
+
+        pixmap = camera_pixmaps.get(camera["imageKey"])
+        if pixmap is None and camera["image"] is None:
+            # The decoding was skipped but the pixmap has been evicted since, so the image is decoded here
+            camera = decode_camera_image({"imageKey": camera["imageKey"], "image": camera["jpeg"]})
+        if pixmap is None:
+            pixmap = QPixmap.fromImage(camera["image"])
+            camera_pixmaps[camera["imageKey"]] = pixmap
+            while len(camera_pixmaps) > MAX_CAMERA_PIXMAPS:
+                camera_pixmaps.popitem(last=False)
+        else:
+            camera_pixmaps.move_to_end(camera["imageKey"])
+        return pixmap
+
+
+    def set_error(self, source, message):
+        """
+        Shows an error in the section of a data source whose request failed
+        :param source: str, name of the data source
+        :param message: str, error message
+        :return: None
+        """
+
+        self.set_text(source, "Failed to load data: " + message)
+
+
+    def set_text(self, source, text):
+        """
+        Shows a text instead of the data in the section of a data source
+        :param source: str, name of the data source
+        :param text: str, text to be shown
+        :return: None
+        """
+
+        if source not in self.sources:
+            return
+        if source == 'weatherData':
+            self.weather_placeholder.setText(text)
+            self.weather_placeholder.show()
+            if self.weather_graph is not None:
+                self.weather_graph.hide()
+        elif source == 'roadCamera':
+            self.camera_label.setText(text)
+        else:
+            self.toolbox_tables[source].set_text(text)
+
+
+    def get_saved_view(self, settings, data):
+        """
+        Returns the view for a saved timeline
+        :param settings: dict, settings of the saved timeline
+        :param data: dict, saved data of the timeline
+        :return: QWidget, the view for the compare tab
         """
 
-        pass
\ No newline at end of file
+        data = data or {}
+        self.build_view(settings, data)
+        for source in self.sources:
+            if source not in data:
+                self.set_text(source, NOT_SAVED_TEXT)
+        return self
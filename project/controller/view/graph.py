@@ -9,6 +9,10 @@ import matplotlib.dates as mdates
 import random as rand
 import PyQt5.QtCore
 
+from instrumentation import span
+
+from .level_of_detail import m4_indices
+
 """This class generates visualizations of requested weather data. Temperature is presented in degrees celsius in linegraph, 
     wind is presented in m/s in scattered graph and cloud coverage is presented in oktas (x/8) in scattered graph. Forecast weather can
     be choose to be shown for 2,4,6,8 or 12 hours. Observed weather shows daily average for every day in given timeframe
@@ -33,6 +37,12 @@ class MplCanvas(FigureCanvasQTAgg):
 
         super().__init__(fig)
 
+    def draw(self):
+        """Renders the figure. The deferred draws of draw_idle end up here, so every render is timed.
+        """
+        with span("render", "weatherData"):
+            super().draw()
+
 
 class GraphWidget(QWidget):
     """Widget containing MPLCanvas to visualize weather data in graph
@@ -48,11 +58,11 @@ class GraphWidget(QWidget):
         radioButtonLayout = QGridLayout()
         self.span = 12
 
-        # Data to be shown in graph
+        # Data to be shown in graph, a TimeSeries
         self.data = data
-        self.city = list(self.data.keys())[0]
-        self.dataKeys = list(self.data[list(self.data.keys())[0]].keys())
-        self.xData = list(self.data[self.city].values())[0]
+        self.city = data.station
+        self.dataKeys = data.parameters
+        self.xData = data.times
         self.dataTypeForecast = True
 
         # Buttons to select what data is highlighted
@@ -66,7 +76,7 @@ class GraphWidget(QWidget):
         vlayout.addLayout(hlayout)
 
         # Create buttons and radiobuttons according to visualized data
-        if len(self.dataKeys) == 3:
+        if len(self.dataKeys) == 2:
             self.dataTypeForecast = True
             twoRB = QRadioButton("2h")
             twoRB.toggled.connect(self.onClicked)
@@ -100,8 +110,10 @@ class GraphWidget(QWidget):
 
         # Create canvas and set it to layout
         self.sc = MplCanvas()
+        self.sc.mpl_connect('resize_event', lambda event: self.refresh_level_of_detail())
         vlayout.addWidget(self.sc)
         self.setLayout(vlayout)
+        self.plot_data()
         self.draw_graph()
 
         # Buttonactions to select what data is highlighet in graph
@@ -120,13 +132,9 @@ class GraphWidget(QWidget):
 
         self.show()
 
-    def draw_graph(self, alphas=[1.0, 1.0, 1.0], grids=[False, False, False], font=['bold', 'bold', 'bold']):
-        """This functions draws the graph. Line chart for temperature and scattered chart for wind and cloudcoverage if necessary
-
-        Args:
-            alphas (list, float): Tells what data is highlighted. Defaults to [1.0, 1.0, 1.0] (All visible).
-            grids (list, bool): Tells what data is highlighted with grid. Defaults to [False, False, False].
-            font (list, bool): Tells what data is higlighted with bold font. Defaults to ['bold', 'bold', 'bold'].
+    def plot_data(self):
+        """Plots the data into persistent artists. Line chart for temperature and scattered chart for wind and
+        cloudcoverage if necessary. Called only when the data changes, highlighting changes the existing artists.
         """
 
         x = self.xData
@@ -135,79 +143,124 @@ class GraphWidget(QWidget):
         self.sc.ax3.cla()
 
         # Y-axis data, y1 = temperature, y2 = wind
-        y1 = self.data[list(self.data.keys())[0]][self.dataKeys[1]]["values"]
-        y2 = self.data[list(self.data.keys())[0]][self.dataKeys[2]]["values"]
+        y1 = self.data[self.dataKeys[0]]
+        y2 = self.data[self.dataKeys[1]]
 
         ax1 = self.sc.ax1
         ax1.set_zorder(1)  # brings ax1 to front
         ax1.patch.set_visible(False)
-        ax1.plot(x, y1, 'r-', label="Temperature", alpha=alphas[0])
-        ax1.set_ylabel('°C', loc='top', color='r',
-                       fontweight=font[0], alpha=alphas[0], rotation=0)
+        self.tempLine, = ax1.plot(x, y1, 'r-', label="Temperature")
+        self.tempLabel = ax1.set_ylabel('°C', loc='top', color='r', rotation=0)
         start, end = ax1.get_ylim()
         ax1.yaxis.set_ticks(np.arange(round(start - 2), round(end + 2), 2))
         ax1.spines['top'].set_visible(False)
-        if grids[0]:
-            ax1.grid(grids[0], linestyle='--', color='r')
 
         ax2 = self.sc.ax2
         ax2.set_visible(True)
-        ax2.scatter(x, y2, marker='4',
-                    alpha=alphas[1],  color='k', label="Wind")
-        ax2.set_ylabel('m/s',  loc='top', color='k',
-                       fontweight=font[1], alpha=alphas[1], rotation=0)
+        self.windScatter = ax2.scatter(x, y2, marker='4', color='k', label="Wind")
+        self.windLabel = ax2.set_ylabel('m/s',  loc='top', color='k', rotation=0)
         start2, end2 = ax2.get_ylim()
         ax2.yaxis.set_ticks(np.arange(0, end2, 1))
         ax2.spines['top'].set_visible(False)
-        if grids[1]:
-            ax2.grid(grids[1], linestyle='--', color='black')
 
         # If shown data is observed data (not forecast) also third y-axis is shown for cloud coverage
+        self.cloudScatter = None
+        self.cloudLabel = None
         if not self.dataTypeForecast:
-            y3 = self.data[self.city][self.dataKeys[3]]["values"]
+            y3 = self.data[self.dataKeys[2]]
             ax3 = self.sc.ax3
             ax3.spines.right.set_position(("axes", 1.05))
-            ax3.scatter(x, y3, marker="o", label="Clouds", alpha=alphas[2])
-            ax3.set_ylabel('/8',  loc='top', color='b',
-                           fontweight=font[2], alpha=alphas[2], rotation=0)
-            #ax3.yaxis.set_ticks(np.arange(0, 8,1))
+            self.cloudScatter = ax3.scatter(x, y3, marker="o", label="Clouds")
+            self.cloudLabel = ax3.set_ylabel('/8',  loc='top', color='b', rotation=0)
             ax3.set_ylim(0, 8.33)
             ax3.spines['top'].set_visible(False)
-            if grids[2]:
-                ax3.grid(grids[2], linestyle='--', color='b')
+        self.sc.ax3.set_visible(not self.dataTypeForecast)
 
-        # Legends and labels according to shown data type. 
-        # If shown data is forecast, legends and labels only for temperature and wind
-        # If shown data is observed, also cloudcoverage is shown
-        line, label = ax1.get_legend_handles_labels()
-        line2, label2 = ax2.get_legend_handles_labels()
-        if self.dataTypeForecast:
-            ax1.legend(line + line2, label + label2, frameon=True, loc='best')
-            self.sc.ax3.set_visible(False)
-        else:
-            line3, label3 = ax3.get_legend_handles_labels()
-            ax1.legend(line + line2 + line3, label + label2 +
-                       label3, frameon=True, loc='best')
-            ax3.set_visible(True)
+        # Only the points needed for the visible x-range are plotted, see refresh_level_of_detail
+        self.xNum = mdates.date2num(x) if len(x) > 0 else np.empty(0)
+        self.lodKey = None
+        ax1.callbacks.connect('xlim_changed', lambda ax: self.refresh_level_of_detail())
 
         self.format_xaxis()
 
+    def draw_graph(self, alphas=[1.0, 1.0, 1.0], grids=[False, False, False], font=['bold', 'bold', 'bold']):
+        """This functions highlights the selected data by changing the existing artists, nothing is replotted
+
+        Args:
+            alphas (list, float): Tells what data is highlighted. Defaults to [1.0, 1.0, 1.0] (All visible).
+            grids (list, bool): Tells what data is highlighted with grid. Defaults to [False, False, False].
+            font (list, bool): Tells what data is higlighted with bold font. Defaults to ['bold', 'bold', 'bold'].
+        """
+
+        self.highlight = (alphas, grids, font)
+        artists = [(self.sc.ax1, self.tempLine, self.tempLabel, 'r'),
+                   (self.sc.ax2, self.windScatter, self.windLabel, 'black')]
+        if self.cloudScatter is not None:
+            artists.append((self.sc.ax3, self.cloudScatter, self.cloudLabel, 'b'))
+
+        for i, (ax, artist, label, color) in enumerate(artists):
+            artist.set_alpha(alphas[i])
+            label.set_alpha(alphas[i])
+            label.set_fontweight(font[i])
+            # grid(False) must be called without line properties, otherwise matplotlib turns the grid on
+            if grids[i]:
+                ax.grid(True, linestyle='--', color=color)
+            else:
+                ax.grid(False)
+
+        # Legends according to shown data type, the legend copies the alpha of the artists so it is recreated
+        # If shown data is forecast, legends only for temperature and wind
+        # If shown data is observed, also cloudcoverage is shown
+        handles = [artist for ax, artist, label, color in artists]
+        self.sc.ax1.legend(handles, [artist.get_label() for artist in handles], frameon=True, loc='best')
+
+        self.sc.draw_idle()
+
+    def refresh_level_of_detail(self):
+        """Decimates the plotted data to the visible x-range and the width of the canvas. Called when the x-range
+        or the size of the canvas changes, and recomputed only if they have changed since the last call.
+        """
+        start, end = self.sc.ax1.get_xlim()
+        width = max(int(self.sc.ax1.bbox.width), 1)
+        if (start, end, width) == self.lodKey:
+            return
+        self.lodKey = (start, end, width)
+
+        y1 = self.data[self.dataKeys[0]]
+        indices = m4_indices(self.xNum, y1, start, end, width)
+        self.tempLine.set_data(self.xNum[indices], y1[indices])
+
+        y2 = self.data[self.dataKeys[1]]
+        indices = m4_indices(self.xNum, y2, start, end, width)
+        self.windScatter.set_offsets(np.column_stack((self.xNum[indices], y2[indices])))
+
+        if self.cloudScatter is not None:
+            y3 = self.data[self.dataKeys[2]]
+            indices = m4_indices(self.xNum, y3, start, end, width)
+            self.cloudScatter.set_offsets(np.column_stack((self.xNum[indices], y3[indices])))
+
+        self.sc.draw_idle()
+
     def get_limits(self):
         """Searches limit values for x-axis according to wanted forecast length and returns their indexes
 
         Returns:
             int, int: indexes of values that limit x-axis
         """
-        now = dt.datetime.now()#.replace(microsecond=0, second=0, minute=0)
-        startIndex = self.xData.index(now)
-        end = now + dt.timedelta(hours=self.span)
-        endIndex = self.xData.index(end)
+        now = np.datetime64(dt.datetime.now(), 's')
+        startIndex = int(np.searchsorted(self.xData, now))
+        end = now + np.timedelta64(self.span, 'h')
+        endIndex = int(np.searchsorted(self.xData, end))
 
         return startIndex, endIndex
 
     def format_xaxis(self):
         """Formats x-axis according to shown data and timewindow. 
         """
+        if len(self.xData) == 0:
+            self.sc.draw_idle()
+            return
+
         if self.dataTypeForecast:
             # Formats x-axis when visualizin forecast data
             # limits axis +-10minutes to show all datapoints properly
@@ -217,8 +270,8 @@ class GraphWidget(QWidget):
                 mdates.DateFormatter("%H:%M"))
             self.sc.ax1.set_xlabel('Time')
             self.sc.figure.autofmt_xdate()
-            self.sc.ax1.set_xbound(x_axis[0] - dt.timedelta(minutes=10),
-                                   x_axis[len(x_axis)-1] + dt.timedelta(minutes=10))
+            self.sc.ax1.set_xbound(mdates.date2num(x_axis[0] - np.timedelta64(10, 'm')),
+                                   mdates.date2num(x_axis[len(x_axis)-1] + np.timedelta64(10, 'm')))
 
         else:
             # Format x-axis when visualizing observed data (Daily average)
@@ -237,19 +290,20 @@ class GraphWidget(QWidget):
                 self.sc.ax1.xaxis.get_ticklabels()) if i % N != 0]
             self.sc.figure.autofmt_xdate(rotation=50)
 
-        self.sc.draw()
+        self.sc.draw_idle()
 
     def update(self, data):
         """Updates visualized data when user requests.
 
         Args:
-            data (dict): New dataset
+            data (TimeSeries): New dataset
         """
         self.data = data
-        self.city = list(data.keys())[0]
-        self.dataKeys = list(data[list(data.keys())[0]].keys())
-        self.xData = list(data[self.city].values())[0]
-        self.draw_graph()
+        self.city = data.station
+        self.dataKeys = data.parameters
+        self.xData = data.times
+        self.plot_data()
+        self.draw_graph(*self.highlight)
 
     def onClicked(self):
         """Sets proper timespan to x-axis according to selected radiobutton
@@ -0,0 +1,64 @@
+import numpy as np
+
+"""Level of detail for plotting long time series. The visible x-range is divided into one bin per pixel column
+    and only the first, last, minimum and maximum point of every bin are plotted (M4 decimation). The plotted
+    line or scatter looks the same as with every point, but the number of points stays proportional to the
+    width of the canvas instead of the length of the time series.
+"""
+
+# Time series with at most this many points per bin in the visible range are plotted without decimation
+POINTS_PER_BIN = 4
+
+
+def visible_indices(x, start, end):
+    """Returns the range of points inside the x-range, with one extra point on both sides so that lines continue
+    to the edges of the plot
+
+    Args:
+        x (numpy array): Sorted x-values
+        start (float): Start of the visible x-range
+        end (float): End of the visible x-range
+
+    Returns:
+        int, int: Index of the first point and index after the last point
+    """
+    first = max(int(np.searchsorted(x, start, side='left')) - 1, 0)
+    last = min(int(np.searchsorted(x, end, side='right')) + 1, len(x))
+    return first, last
+
+
+def m4_indices(x, y, start, end, bin_count):
+    """Selects the points to be plotted in the x-range
+
+    Args:
+        x (numpy array): Sorted x-values
+        y (numpy array): Y-values, NaN for missing values
+        start (float): Start of the visible x-range
+        end (float): End of the visible x-range
+        bin_count (int): Number of bins, usually the width of the plot in pixels
+
+    Returns:
+        numpy array: Ascending indices of the points to be plotted
+    """
+    first, last = visible_indices(x, start, end)
+    if last - first <= POINTS_PER_BIN * bin_count or end <= start:
+        return np.arange(first, last)
+
+    # Bins of the points, the points are sorted by x so every bin is a contiguous segment
+    bins = np.clip(((x[first:last] - start) / (end - start) * bin_count).astype(np.int64), -1, bin_count)
+    segment_starts = np.flatnonzero(np.diff(bins, prepend=bins[0] - 1))
+    segment_ends = np.append(segment_starts[1:], len(bins))
+
+    # Missing values are never the minimum or the maximum of a bin
+    values = y[first:last]
+    missing = np.isnan(values)
+    lengths = segment_ends - segment_starts
+    indices = [segment_starts, segment_ends - 1]
+    for keys, reduce in [(np.where(missing, np.inf, values), np.minimum),
+                         (np.where(missing, -np.inf, values), np.maximum)]:
+        # First point of every bin that has the extreme value of the bin
+        extremes = np.repeat(reduce.reduceat(keys, segment_starts), lengths)
+        positions = np.flatnonzero(keys == extremes)
+        indices.append(positions[np.searchsorted(positions, segment_starts)])
+
+    return first + np.unique(np.concatenate(indices))